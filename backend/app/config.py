@@ -26,6 +26,26 @@ class Settings(BaseSettings):
         default="sqlite:///./contractor_vault.db",
         description="SQLAlchemy database URL"
     )
+    db_pool_size: int = Field(
+        default=20,
+        description="Persistent connections kept per worker (ignored for SQLite)"
+    )
+    db_max_overflow: int = Field(
+        default=40,
+        description="Extra connections allowed during bursts (ignored for SQLite)"
+    )
+    db_pool_recycle_seconds: int = Field(
+        default=1800,
+        description="Recycle pooled connections older than this many seconds"
+    )
+    db_pool_timeout_seconds: int = Field(
+        default=5,
+        description="Seconds to wait for a free pooled connection before failing"
+    )
+    db_external_pooler: bool = Field(
+        default=False,
+        description="Connect through an external pooler (e.g. PgBouncer); disables in-process pooling"
+    )
     
     # Application settings
     app_name: str = Field(default="ShadowKey")
@@ -41,6 +61,10 @@ class Settings(BaseSettings):
         default=480,
         description="Maximum allowed token duration (8 hours)"
     )
+    claim_base_url: str = Field(
+        default="https://app.contractorvault.com/claim/",
+        description="Prefix of the claim links handed to contractors"
+    )
     
     # JWT settings
     jwt_algorithm: str = Field(default="HS256")
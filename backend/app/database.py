@@ -2,9 +2,10 @@
 Contractor Vault - Database Module
 SQLAlchemy setup with async support for SQLite MVP
 """
-from sqlalchemy import create_engine, event
+from datetime import timezone
+from sqlalchemy import DateTime, TypeDecorator, create_engine, event
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool, StaticPool
 import logging
 
 from app.config import get_settings
@@ -17,6 +18,30 @@ class Base(DeclarativeBase):
     pass
 
 
+class UTCDateTime(TypeDecorator):
+    """
+    DateTime that always loads as timezone-aware UTC.
+    
+    SQLite drops the offset on storage, so rows read back naive while the
+    objects that created them (kept after commit) hold aware values. Values
+    are written as UTC and tagged as UTC on load, so both paths agree.
+    """
+    impl = DateTime
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+            if not self.impl.timezone:
+                value = value.replace(tzinfo=None)
+        return value
+    
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
 def get_engine():
     """
     Create SQLAlchemy engine.
@@ -45,10 +70,25 @@ def get_engine():
             cursor = dbapi_connection.cursor()
             cursor.execute("PRAGMA foreign_keys=ON")
             cursor.close()
+    elif settings.db_external_pooler:
+        # PgBouncer (or similar) already pools server connections; holding
+        # a second pool here would just pin its client slots
+        engine = create_engine(
+            settings.database_url,
+            poolclass=NullPool,
+            echo=settings.debug,
+        )
     else:
         # PostgreSQL or other databases
+        # Pool is sized for bursts of concurrent claim/log requests; pre-ping
+        # and recycle drop connections the server or a proxy has closed.
         engine = create_engine(
             settings.database_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=settings.db_pool_recycle_seconds,
+            pool_timeout=settings.db_pool_timeout_seconds,
             echo=settings.debug,
         )
     
@@ -57,7 +97,10 @@ def get_engine():
 
 # Create engine and session factory
 engine = get_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit without a reload; every column default
+# is applied client-side, so flushed state already matches the row (and
+# UTCDateTime columns load as aware UTC, like the values held in memory)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
 
 
 def get_db():
@@ -72,6 +115,97 @@ def get_db():
         db.close()
 
 
+# Indexes removed from the models that older databases may still carry
+RETIRED_INDEXES = (
+    # Duplicated the unique constraint's own index on session_tokens.token
+    "ix_session_tokens_token",
+    # Activity dedup on the raw url; replaced by uix_activity_url_hash_dedup
+    "uix_activity_dedup",
+    # Superseded by ix_session_activities_token_timestamp_id
+    "ix_session_activities_token_timestamp",
+)
+
+
+def ensure_indexes():
+    """
+    Create any declared indexes missing from existing tables.
+    create_all() only builds indexes together with a new table, so indexes
+    added to a model later have to be created here. Retired indexes are
+    dropped so writes stop maintaining them.
+    
+    A unique index that cannot be built stops startup: writes rely on it
+    for ON CONFLICT, and would all fail without it.
+    """
+    from sqlalchemy import text
+    
+    for name in RETIRED_INDEXES:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        except Exception as e:
+            logger.warning(f"Could not drop index {name}: {e}")
+    
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except Exception as e:
+                if index.unique:
+                    raise RuntimeError(f"Could not create unique index {index.name}: {e}") from e
+                logger.warning(f"Could not create index {index.name}: {e}")
+
+
+def ensure_column(table: str, column: str, ddl_type: str) -> bool:
+    """
+    Add a nullable column to an existing table if it is missing.
+    Returns True when the column was added.
+    """
+    from sqlalchemy import inspect, text
+    
+    columns = {c["name"] for c in inspect(engine).get_columns(table)}
+    if column in columns:
+        return False
+    
+    logger.info(f"Adding {column} column to {table} table...")
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl_type}"))
+    return True
+
+
+def migrate_activity_dedup():
+    """
+    Prepare session_activities for the url_hash dedup index.
+    
+    Older tables lack url_hash and may hold duplicate rows that would make
+    the unique index fail, so backfill the hashes and keep one row per
+    (session_token_id, url_hash, timestamp) before the index is built.
+    Runs only while the index is missing.
+    """
+    from sqlalchemy import inspect, text
+    from app.models.session_activity import SessionActivity
+    
+    existing = {ix["name"] for ix in inspect(engine).get_indexes("session_activities")}
+    if "uix_activity_url_hash_dedup" in existing:
+        return
+    
+    ensure_column("session_activities", "url_hash", "VARCHAR(32)")
+    with engine.begin() as conn:
+        rows = conn.execute(text("SELECT id, url FROM session_activities WHERE url_hash IS NULL")).all()
+        if rows:
+            conn.execute(
+                text("UPDATE session_activities SET url_hash = :url_hash WHERE id = :id"),
+                [{"id": row.id, "url_hash": SessionActivity.hash_url(row.url)} for row in rows]
+            )
+        removed = conn.execute(text("""
+            DELETE FROM session_activities WHERE id NOT IN (
+                SELECT MIN(id) FROM session_activities
+                GROUP BY session_token_id, url_hash, timestamp
+            )
+        """)).rowcount
+    if rows or removed:
+        logger.info(f"Backfilled {len(rows)} activity url hashes, removed {removed} duplicate activities")
+
+
 def init_db():
     """
     Initialize database tables.
@@ -79,10 +213,12 @@ def init_db():
     """
     # Import all models to register them with Base
     from app.models import credential, session_token, audit_log
-    from app.models.user import User, OTPCode
+    from app.models.user import User, OTPCode, PasswordResetToken
     
     logger.info("Creating database tables...")
     Base.metadata.create_all(bind=engine)
+    migrate_activity_dedup()
+    ensure_indexes()
     
     # Manual migration: Add password_hash column to users table if it doesn't exist
     try:
@@ -138,5 +274,23 @@ def init_db():
     except Exception as e:
         logger.warning(f"Migration check failed: {e}")
     
+    # Migration: denormalized target_url on session_tokens
+    try:
+        from sqlalchemy import text
+        
+        if ensure_column("session_tokens", "target_url", "VARCHAR(2048)"):
+            with engine.begin() as conn:
+                for source in ("credentials", "stored_sessions"):
+                    conn.execute(text(f"""
+                        UPDATE session_tokens SET target_url = (
+                            SELECT target_url FROM {source}
+                            WHERE {source}.id = session_tokens.credential_id
+                        )
+                        WHERE target_url IS NULL
+                    """))
+            logger.info("target_url column added and backfilled.")
+    except Exception as e:
+        logger.warning(f"Migration check failed: {e}")
+    
     logger.info("Database tables created successfully.")
 
@@ -33,9 +33,10 @@ def get_client_ip(request: Request) -> str:
     2. X-Real-IP
     3. Direct client IP
     """
-    forwarded_for = request.headers.get("x-forwarded-for")
+    # partition stops at the first comma instead of splitting the whole chain
+    forwarded_for = request.headers.get("x-forwarded-for", "").partition(",")[0].strip()
     if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
+        return forwarded_for
     
     real_ip = request.headers.get("x-real-ip")
     if real_ip:
@@ -45,3 +46,6 @@ def get_client_ip(request: Request) -> str:
         return request.client.host
     
     return "unknown"
+
+
+ClientIP = Annotated[str, Depends(get_client_ip)]
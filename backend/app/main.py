@@ -2,6 +2,7 @@
 Contractor Vault - FastAPI Application
 Main entry point with CORS and route registration
 """
+import asyncio
 import logging
 import sys
 from contextlib import asynccontextmanager
@@ -10,6 +11,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import get_settings
 from app.database import init_db
+from app.services.usage_buffer import get_usage_buffer
+from app.services.otp_cleanup import run_otp_purge
 from app.middleware import AuditMiddleware
 from app.routers import access_router, credentials_router, audit_router, analytics_router, activity_router, email_router, contractor_router, passkey_router, device_router, secrets_router, discovery_router
 from app.routers.sessions import router as sessions_router
@@ -36,9 +39,18 @@ async def lifespan(app: FastAPI):
     logger.info(f"Configuration: {settings.app_name}")
     init_db()
     logger.info("Database initialized")
+    usage_flusher = asyncio.create_task(get_usage_buffer().run())
+    otp_purger = asyncio.create_task(run_otp_purge())
     logger.info("=" * 60)
     yield
     logger.info("Shutting down...")
+    otp_purger.cancel()
+    usage_flusher.cancel()
+    for task in (otp_purger, usage_flusher):
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
 
 def create_app() -> FastAPI:
@@ -6,7 +6,7 @@ from app.models.stored_session import StoredSession
 from app.models.session_activity import SessionActivity
 from app.models.detected_signup import DetectedSignup, SignupStatus
 from app.models.contractor_account import ContractorAccount, ClientLink
-from app.models.user import User, OTPCode
+from app.models.user import User, OTPCode, PasswordResetToken
 from app.models.passkey import PasskeyCredential, PasskeyChallenge
 from app.models.device import DeviceInfo
 from app.models.secret import Secret, SecretType
@@ -15,7 +15,7 @@ from app.models.saas_app import SaaSApp, RiskLevel, AppCategory
 __all__ = [
     "Credential", "SessionToken", "AuditLog", "AuditAction", 
     "StoredSession", "SessionActivity", "DetectedSignup", "SignupStatus",
-    "ContractorAccount", "ClientLink", "User", "OTPCode",
+    "ContractorAccount", "ClientLink", "User", "OTPCode", "PasswordResetToken",
     "PasskeyCredential", "PasskeyChallenge", "DeviceInfo",
     "Secret", "SecretType", "SaaSApp", "RiskLevel", "AppCategory"
 ]
@@ -2,15 +2,15 @@
 Contractor Vault - Audit Log Model
 Immutable audit trail for SOC2 compliance
 """
-import uuid
 from datetime import datetime, timezone
 from enum import Enum
 from typing import Any
-from sqlalchemy import String, DateTime, Text, Index, Enum as SQLEnum
+from sqlalchemy import String, Text, Index, Enum as SQLEnum
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.sqlite import JSON
 
-from app.database import Base
+from app.database import Base, UTCDateTime
+from app.utils.ids import uuid7
 
 
 class AuditAction(str, Enum):
@@ -56,17 +56,17 @@ class AuditLog(Base):
         Index("ix_audit_logs_target_resource", "target_resource"),
     )
     
-    # UUID primary key
+    # UUIDv7 primary key (time-ordered, keeps inserts append-only)
     id: Mapped[str] = mapped_column(
         String(36),
         primary_key=True,
-        default=lambda: str(uuid.uuid4()),
+        default=lambda: str(uuid7()),
         comment="Unique identifier for audit entry"
     )
     
     # Timestamp in UTC - ISO 8601 compliant
     timestamp: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc),
         comment="When the action occurred (UTC)"
@@ -135,3 +135,13 @@ class AuditLog(Base):
             f"actor='{self.actor}', "
             f"timestamp={self.timestamp.isoformat()})>"
         )
+
+
+# Per-actor reports filter on actor, sort newest first and optionally filter
+# by action; keeping all three in one index avoids a separate sort step.
+Index(
+    "ix_audit_logs_actor_ts_action",
+    AuditLog.actor,
+    AuditLog.timestamp.desc(),
+    AuditLog.action,
+)
@@ -5,10 +5,10 @@ Supports contractors having one master account linked to multiple clients.
 import uuid
 import secrets
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Text, Boolean, Index, ForeignKey
+from sqlalchemy import String, Text, Boolean, Index, ForeignKey, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 def generate_magic_token():
@@ -27,6 +27,13 @@ class ContractorAccount(Base):
     
     __table_args__ = (
         Index("ix_contractor_accounts_email", "email", unique=True),
+        # Only accounts with an outstanding magic link are indexed
+        Index(
+            "ix_contractor_accounts_magic_token",
+            "magic_token",
+            postgresql_where=text("magic_token IS NOT NULL"),
+            sqlite_where=text("magic_token IS NOT NULL"),
+        ),
     )
     
     id: Mapped[str] = mapped_column(
@@ -58,7 +65,7 @@ class ContractorAccount(Base):
     )
     
     magic_token_expires: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When magic token expires"
     )
@@ -72,19 +79,19 @@ class ContractorAccount(Base):
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
     
     last_login: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="Last successful login"
     )
     
-    # Relationships
-    client_links = relationship("ClientLink", back_populates="contractor")
+    # Relationships (lazy="raise": load explicitly, never one query per access)
+    client_links = relationship("ClientLink", back_populates="contractor", lazy="raise")
     
     def __repr__(self) -> str:
         return f"<ContractorAccount(email={self.email})>"
@@ -99,8 +106,11 @@ class ClientLink(Base):
     __tablename__ = "client_links"
     
     __table_args__ = (
-        Index("ix_client_links_contractor", "contractor_id"),
+        # Serves contractor_id lookups alone and with the is_active filter
+        Index("ix_client_links_contractor_active", "contractor_id", "is_active"),
         Index("ix_client_links_client_name", "client_name"),
+        # One link per contractor/client pair, enforced by the database
+        Index("uix_client_links_contractor_client", "contractor_id", "client_name", unique=True),
     )
     
     id: Mapped[str] = mapped_column(
@@ -137,14 +147,14 @@ class ClientLink(Base):
     )
     
     invited_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         default=lambda: datetime.now(timezone.utc)
     )
     
     # Link status
     linked_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
@@ -4,11 +4,11 @@ Stores encrypted credentials with full audit trail
 """
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, LargeBinary, DateTime, Text
+from sqlalchemy import String, LargeBinary, Text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import TYPE_CHECKING
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 if TYPE_CHECKING:
     from app.models.session_token import SessionToken
@@ -55,7 +55,7 @@ class Credential(Base):
     encrypted_password: Mapped[bytes] = mapped_column(
         LargeBinary,
         nullable=False,
-        comment="Fernet encrypted password"
+        comment="AES-GCM encrypted password"
     )
     
     # Optional notes (also encrypted in a real production system)
@@ -73,13 +73,13 @@ class Credential(Base):
     )
     
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
     
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc)
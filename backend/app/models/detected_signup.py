@@ -4,11 +4,11 @@ Stores detected service signups from contractor emails.
 """
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Text, Index, Enum
+from sqlalchemy import String, Text, Index, Enum
 from sqlalchemy.orm import Mapped, mapped_column
 import enum
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class SignupStatus(str, enum.Enum):
@@ -30,6 +30,11 @@ class DetectedSignup(Base):
     __table_args__ = (
         Index("ix_detected_signups_contractor", "contractor_email"),
         Index("ix_detected_signups_status", "status"),
+        # Dashboard summary groups ACTIVE signups by service; the index
+        # alone answers the GROUP BY
+        Index("ix_detected_signups_status_service", "status", "service_name"),
+        # Per-contractor summary groups by (status, service_name)
+        Index("ix_detected_signups_contractor_status_service", "contractor_email", "status", "service_name"),
     )
     
     id: Mapped[str] = mapped_column(
@@ -72,14 +77,14 @@ class DetectedSignup(Base):
     )
     
     email_date: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         comment="When the email was received"
     )
     
     # Detection metadata
     detected_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc),
         comment="When we detected this signup"
@@ -101,7 +106,7 @@ class DetectedSignup(Base):
     )
     
     dismissed_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When this was dismissed"
     )
@@ -120,3 +125,28 @@ class DetectedSignup(Base):
     
     def __repr__(self) -> str:
         return f"<DetectedSignup(contractor={self.contractor_email}, service={self.service_name}, status={self.status})>"
+
+
+# Keyset pagination for GET /api/discovery/detections walks this index in
+# (detected_at, id) order, so deep pages cost the same as the first one
+Index(
+    "ix_detected_signups_detected_at_id",
+    DetectedSignup.detected_at.desc(),
+    DetectedSignup.id.desc(),
+)
+
+# Status-filtered detection lists (per contractor or across all of them)
+# read newest first straight off these, with no Sort before the LIMIT; the
+# first also serves the dashboard's GROUP BY contractor over ACTIVE rows
+Index(
+    "ix_detected_signups_status_contractor_detected_at",
+    DetectedSignup.status,
+    DetectedSignup.contractor_email,
+    DetectedSignup.detected_at.desc(),
+)
+
+Index(
+    "ix_detected_signups_status_detected_at",
+    DetectedSignup.status,
+    DetectedSignup.detected_at.desc(),
+)
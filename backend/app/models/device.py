@@ -4,10 +4,10 @@ Device fingerprinting and trust management for Zero Trust security
 """
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Boolean, Integer, Index, Text
+from sqlalchemy import String, Boolean, Integer, Index, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class DeviceInfo(Base):
@@ -127,13 +127,13 @@ class DeviceInfo(Base):
     
     # Usage tracking
     first_seen: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
     
     last_seen: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
@@ -154,7 +154,7 @@ class DeviceInfo(Base):
     )
     
     last_failed_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="Last failed access attempt"
     )
@@ -167,7 +167,7 @@ class DeviceInfo(Base):
     )
     
     trusted_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When device was marked trusted"
     )
@@ -179,7 +179,7 @@ class DeviceInfo(Base):
     )
     
     blocked_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When device was blocked"
     )
@@ -193,3 +193,13 @@ class DeviceInfo(Base):
     def __repr__(self) -> str:
         status = "trusted" if self.is_trusted else ("blocked" if self.is_blocked else "unknown")
         return f"<DeviceInfo(contractor={self.contractor_email}, status={status}, score={self.trust_score})>"
+
+
+# GET /api/devices?blocked_only=true reads blocked devices newest first;
+# only blocked rows are indexed, so the scan stays as small as that subset
+Index(
+    "ix_device_blocked_last_seen",
+    DeviceInfo.last_seen.desc(),
+    postgresql_where=DeviceInfo.is_blocked == True,
+    sqlite_where=DeviceInfo.is_blocked == True,
+)
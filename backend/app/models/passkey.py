@@ -4,10 +4,10 @@ WebAuthn/FIDO2 credentials for passwordless authentication
 """
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, LargeBinary, Integer, Boolean, Index
+from sqlalchemy import String, LargeBinary, Integer, Boolean, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class PasskeyCredential(Base):
@@ -93,13 +93,13 @@ class PasskeyCredential(Base):
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
     
     last_used_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="Last successful authentication"
     )
@@ -153,7 +153,7 @@ class PasskeyChallenge(Base):
     
     # Validity
     expires_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         comment="Challenge expiration (usually 5 minutes)"
     )
@@ -166,7 +166,7 @@ class PasskeyChallenge(Base):
     )
     
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
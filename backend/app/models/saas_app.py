@@ -5,10 +5,10 @@ Catalog of known SaaS applications for shadow IT detection
 import uuid
 import enum
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Integer, Boolean, Text, Index
+from sqlalchemy import String, Integer, Boolean, Text, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class RiskLevel(str, enum.Enum):
@@ -173,13 +173,13 @@ class SaaSApp(Base):
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
     
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc)
@@ -189,6 +189,16 @@ class SaaSApp(Base):
         return f"<SaaSApp(name={self.name}, risk={self.risk_level}, approved={self.is_approved})>"
 
 
+# The discovery report's unapproved count joins detections to apps that are
+# neither approved nor banned; index just those domains
+Index(
+    "ix_saas_apps_unreviewed_domain",
+    SaaSApp.domain,
+    postgresql_where=(SaaSApp.is_approved == False) & (SaaSApp.is_banned == False),
+    sqlite_where=(SaaSApp.is_approved == False) & (SaaSApp.is_banned == False),
+)
+
+
 # Pre-populate with common apps
 KNOWN_SAAS_APPS = [
     {"name": "Slack", "domain": "slack.com", "category": "communication", "risk_level": "low", "risk_score": 20, "has_soc2": True},
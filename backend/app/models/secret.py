@@ -5,10 +5,10 @@ Secrets management for API keys, database credentials, SSH keys, environment var
 import uuid
 import enum
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, LargeBinary, Boolean, Text, Index, JSON
+from sqlalchemy import String, LargeBinary, Boolean, Text, Index, JSON, case, false, func
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class SecretType(str, enum.Enum):
@@ -66,7 +66,7 @@ class Secret(Base):
     encrypted_value: Mapped[bytes] = mapped_column(
         LargeBinary,
         nullable=False,
-        comment="Fernet-encrypted secret value"
+        comment="AES-GCM encrypted secret value"
     )
     
     # Optional description
@@ -109,7 +109,7 @@ class Secret(Base):
     
     # Rotation tracking
     last_rotated_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When secret was last rotated"
     )
@@ -121,20 +121,20 @@ class Secret(Base):
     
     # Expiration (for tokens that expire)
     expires_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When this secret expires (if applicable)"
     )
     
     # Timestamps
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
     
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc)
@@ -147,7 +147,7 @@ class Secret(Base):
     )
     
     last_accessed_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="Last time this secret was accessed"
     )
@@ -184,5 +184,20 @@ class Secret(Base):
             
         return now > last_rotation + timedelta(days=self.rotation_reminder_days)
     
+    @classmethod
+    def needs_rotation_expr(cls, dialect_name: str):
+        """
+        SQL equivalent of needs_rotation(), for computing it in list queries.
+        
+        Date arithmetic differs per backend: intervals on PostgreSQL,
+        julianday() on SQLite (which stores naive UTC timestamps).
+        """
+        last_rotation = func.coalesce(cls.last_rotated_at, cls.created_at)
+        if dialect_name == "postgresql":
+            due = func.now() > last_rotation + func.make_interval(0, 0, 0, cls.rotation_reminder_days)
+        else:
+            due = func.julianday("now") - func.julianday(last_rotation) > cls.rotation_reminder_days
+        return case((cls.rotation_reminder_days.is_(None), false()), else_=due)
+    
     def __repr__(self) -> str:
         return f"<Secret(name={self.name}, type={self.secret_type}, active={self.is_active})>"
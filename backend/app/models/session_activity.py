@@ -2,12 +2,13 @@
 Session Activity Model - URL Traversal Logging
 Tracks every URL visited during an active session for forensic auditing.
 """
+import hashlib
 import uuid
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Integer, Text, ForeignKey, Index
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, Text, ForeignKey, Index
+from sqlalchemy.orm import Mapped, backref, mapped_column, relationship
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class SessionActivity(Base):
@@ -24,6 +25,11 @@ class SessionActivity(Base):
     __table_args__ = (
         Index("ix_session_activities_token_id", "session_token_id"),
         Index("ix_session_activities_timestamp", "timestamp"),
+        # Activity pages walk (timestamp, id) within a token
+        Index("ix_session_activities_token_timestamp_id", "session_token_id", "timestamp", "id"),
+        # Idempotency key for extension batches (INSERT ... ON CONFLICT DO NOTHING);
+        # keyed on the fixed-width url_hash, since URLs are unbounded Text
+        Index("uix_activity_url_hash_dedup", "session_token_id", "url_hash", "timestamp", unique=True),
     )
     
     id: Mapped[str] = mapped_column(
@@ -47,6 +53,12 @@ class SessionActivity(Base):
         comment="Full URL visited"
     )
     
+    url_hash: Mapped[str] = mapped_column(
+        String(32),
+        nullable=False,
+        comment="blake2b digest of url, used by the dedup index"
+    )
+    
     title: Mapped[str | None] = mapped_column(
         String(500),
         nullable=True,
@@ -68,7 +80,7 @@ class SessionActivity(Base):
     
     # Timing
     timestamp: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc),
         comment="When this URL was visited"
@@ -80,8 +92,18 @@ class SessionActivity(Base):
         comment="Time spent on this page in milliseconds"
     )
     
-    # Relationship
-    session_token = relationship("SessionToken", backref="activities")
+    # Relationship; never lazy-loaded, so serializing a list of
+    # activities cannot fan out into one token query per row
+    session_token = relationship(
+        "SessionToken",
+        backref=backref("activities", lazy="raise"),
+        lazy="raise",
+    )
+    
+    @staticmethod
+    def hash_url(url: str) -> str:
+        """Digest a URL for the dedup index (32-char hex blake2b)."""
+        return hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
     
     def __repr__(self) -> str:
         return f"<SessionActivity(token={self.session_token_id[:8]}..., url={self.url[:50]})>"
@@ -5,11 +5,11 @@ Time-bombed access tokens linking contractors to credentials
 import uuid
 import secrets
 from datetime import datetime, timezone
-from sqlalchemy import String, DateTime, Boolean, ForeignKey, Index
+from sqlalchemy import String, Boolean, ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from typing import TYPE_CHECKING
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 if TYPE_CHECKING:
     from app.models.credential import Credential
@@ -32,9 +32,9 @@ class SessionToken(Base):
     """
     __tablename__ = "session_tokens"
     
-    # Indexes for performance on common queries
+    # Indexes for performance on common queries; token lookups use the
+    # index behind its unique constraint
     __table_args__ = (
-        Index("ix_session_tokens_token", "token"),
         Index("ix_session_tokens_contractor_email", "contractor_email"),
         Index("ix_session_tokens_expires_at", "expires_at"),
     )
@@ -62,6 +62,14 @@ class SessionToken(Base):
         comment="ID of the credential or stored session being accessed"
     )
     
+    # Denormalized from the credential/stored session so access checks and
+    # audit logging don't need a join
+    target_url: Mapped[str | None] = mapped_column(
+        String(2048),
+        nullable=True,
+        comment="Target URL of the credential or stored session at grant time"
+    )
+    
     # Contractor identification
     contractor_email: Mapped[str] = mapped_column(
         String(255),
@@ -86,7 +94,7 @@ class SessionToken(Base):
     
     # Token validity
     expires_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         comment="Token expiration timestamp (UTC)"
     )
@@ -100,7 +108,7 @@ class SessionToken(Base):
     )
     
     revoked_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="When the token was revoked"
     )
@@ -113,7 +121,7 @@ class SessionToken(Base):
     
     # Audit fields
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=False,
         default=lambda: datetime.now(timezone.utc)
     )
@@ -126,7 +134,7 @@ class SessionToken(Base):
     
     # Usage tracking
     last_used_at: Mapped[datetime | None] = mapped_column(
-        DateTime(timezone=True),
+        UTCDateTime(timezone=True),
         nullable=True,
         comment="Last time this token was used"
     )
@@ -6,10 +6,10 @@ import json
 from datetime import datetime, timezone
 from typing import Any, Optional
 
-from sqlalchemy import String, Text, DateTime, Boolean, JSON
+from sqlalchemy import String, Text, Boolean, JSON, Index
 from sqlalchemy.orm import Mapped, mapped_column
 
-from app.database import Base
+from app.database import Base, UTCDateTime
 
 
 class StoredSession(Base):
@@ -46,12 +46,12 @@ class StoredSession(Base):
     notes: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     created_by: Mapped[str] = mapped_column(String(255), nullable=False)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime,
+        UTCDateTime,
         default=lambda: datetime.now(timezone.utc),
         nullable=False
     )
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime,
+        UTCDateTime,
         default=lambda: datetime.now(timezone.utc),
         onupdate=lambda: datetime.now(timezone.utc),
         nullable=False
@@ -62,3 +62,14 @@ class StoredSession(Base):
     
     def __repr__(self) -> str:
         return f"<StoredSession(id={self.id}, name={self.name}, domain={self.target_domain})>"
+
+
+# list_sessions pages through active sessions in id order; a partial index
+# serves that order and keeps soft-deleted rows out of the scan. Lookups by
+# id use the primary key.
+Index(
+    "ix_stored_sessions_active",
+    StoredSession.id,
+    postgresql_where=StoredSession.is_active == True,
+    sqlite_where=StoredSession.is_active == True,
+)
@@ -2,8 +2,10 @@
 User and OTP models for authentication
 """
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import Column, String, DateTime, Boolean, Integer
-from app.database import Base
+from sqlalchemy import Column, String, Boolean, Integer, Index
+from app.database import Base, UTCDateTime
+from app.utils.ids import uuid7
+import hashlib
 import secrets
 
 
@@ -14,14 +16,16 @@ class User(Base):
     id = Column(String, primary_key=True)
     email = Column(String, unique=True, nullable=False, index=True)
     password_hash = Column(String, nullable=True)  # Bcrypt hash for per-user passwords
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    last_login = Column(DateTime, nullable=True)
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    last_login = Column(UTCDateTime, nullable=True)
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
     
     @classmethod
     def generate_id(cls) -> str:
-        return f"user_{secrets.token_hex(12)}"
+        # UUIDv7 hex starts with the millisecond timestamp, so ids sort by
+        # creation time; keep the original 24-char suffix length
+        return f"user_{uuid7().hex[:24]}"
     
     def set_password(self, password: str) -> None:
         """Hash and set the user's password."""
@@ -43,8 +47,8 @@ class OTPCode(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     email = Column(String, nullable=False, index=True)
     code = Column(String(6), nullable=False)
-    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
-    expires_at = Column(DateTime, nullable=False)
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(UTCDateTime, nullable=False)
     used = Column(Boolean, default=False)
     
     @classmethod
@@ -71,3 +75,46 @@ class OTPCode(Base):
         if expires.tzinfo is None:
             expires = expires.replace(tzinfo=timezone.utc)
         return not self.used and expires > now
+
+
+class PasswordResetToken(Base):
+    """
+    Issued password reset token, stored only as a digest.
+    
+    The JWT carries the claims; this row makes each token single-use and
+    revocable. The primary key is the 32-char hex blake2b digest, so
+    lookups are a fixed-width equality probe.
+    """
+    __tablename__ = "password_reset_tokens"
+    
+    token_hash = Column(String(32), primary_key=True)
+    user_id = Column(String, nullable=False, index=True)
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    expires_at = Column(UTCDateTime, nullable=False)
+    used = Column(Boolean, default=False, nullable=False)
+    
+    @staticmethod
+    def hash_token(token: str) -> str:
+        """Digest a raw reset token for storage and lookup."""
+        return hashlib.blake2b(token.encode(), digest_size=16).hexdigest()
+
+
+# Partial index for the "invalidate outstanding codes" lookup in request-otp;
+# only unused codes are indexed, so it stays small as history grows.
+Index(
+    "ix_otp_email_unused",
+    OTPCode.email,
+    postgresql_where=OTPCode.used == False,
+    sqlite_where=OTPCode.used == False,
+)
+
+# Covers verify-otp: equality on (email, code) over unused codes, newest
+# first, so the lookup is one index range scan with no sort.
+Index(
+    "ix_otp_email_code_unused_created",
+    OTPCode.email,
+    OTPCode.code,
+    OTPCode.created_at.desc(),
+    postgresql_where=OTPCode.used == False,
+    sqlite_where=OTPCode.used == False,
+)
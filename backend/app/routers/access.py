@@ -3,12 +3,16 @@ Contractor Vault - Access Router
 Token generation, claiming, and revocation endpoints
 """
 import base64
+import functools
 import logging
 from datetime import datetime, timezone
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from anyio import from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy import select, update
 from sqlalchemy.orm import Session
 
+from app.config import get_settings
 from app.database import get_db
 from app.models import Credential, SessionToken, AuditLog, AuditAction
 from app.schemas.session_token import (
@@ -25,6 +29,8 @@ from app.services.encryption import get_encryption_service, EncryptionService
 from app.services.token_service import get_token_service, TokenService
 from app.services.audit_service import AuditService
 from app.services.discord_webhook import get_discord_service
+from app.services.usage_buffer import get_usage_buffer
+from app.services import revocation_cache
 from app.middleware.audit_middleware import get_audit_context
 from app.routers.auth import require_auth
 from app.models.user import User
@@ -33,6 +39,14 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/access", tags=["Access Control"])
 
+# Claim links are the token appended to this prefix
+_CLAIM_PREFIX = get_settings().claim_base_url
+
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive timestamps (SQLite) as UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
 
 def get_audit_service(db: Session = Depends(get_db)) -> AuditService:
     """Dependency for audit service."""
@@ -44,7 +58,7 @@ def get_audit_service(db: Session = Depends(get_db)) -> AuditService:
     response_model=list[TokenListItem],
     summary="List access tokens created by the current user"
 )
-async def list_tokens(
+def list_tokens(
     db: Annotated[Session, Depends(get_db)],
     current_user: User = Depends(require_auth),
     status_filter: str | None = None,
@@ -132,9 +146,10 @@ async def list_tokens(
     status_code=status.HTTP_201_CREATED,
     summary="Generate a time-bombed access token for a contractor"
 )
-async def generate_access_token(
+def generate_access_token(
     request: Request,
     payload: GenerateTokenRequest,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     token_service: Annotated[TokenService, Depends(get_token_service)],
     audit_service: Annotated[AuditService, Depends(get_audit_service)],
@@ -166,6 +181,7 @@ async def generate_access_token(
     # Create session token
     session_token = SessionToken(
         credential_id=credential.id,
+        target_url=credential.target_url,
         contractor_email=payload.contractor_email,
         expires_at=expires_at,
         created_by=payload.admin_email,
@@ -201,16 +217,17 @@ async def generate_access_token(
         description=f"Granted {payload.duration_minutes}min access to {credential.name} for {payload.contractor_email}"
     )
     
-    claim_url = f"https://app.contractorvault.com/claim/{session_token.token}"
+    claim_url = _CLAIM_PREFIX + session_token.token
     
     logger.info(
         f"Generated access token for {payload.contractor_email} "
         f"to {credential.name}, expires at {expires_at.isoformat()}"
     )
     
-    # Send Discord notification
+    # Send Discord notification after the response is sent
     discord = get_discord_service()
-    await discord.notify_access_granted(
+    background_tasks.add_task(
+        discord.notify_access_granted,
         contractor_email=payload.contractor_email,
         credential_name=credential.name,
         duration_minutes=payload.duration_minutes,
@@ -235,9 +252,10 @@ async def generate_access_token(
     response_model=ClaimTokenResponse,
     summary="Claim an access token and receive encrypted credentials"
 )
-async def claim_token(
+def claim_token(
     request: Request,
     token: str,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     encryption_service: Annotated[EncryptionService, Depends(get_encryption_service)],
     audit_service: Annotated[AuditService, Depends(get_audit_service)],
@@ -249,63 +267,93 @@ async def claim_token(
     - Returns encrypted password for client-side decryption
     - Logs INJECTION_SUCCESS to audit trail
     """
-    # Find the session token
-    session_token = db.query(SessionToken).filter(
-        SessionToken.token == token
-    ).first()
+    # Known-revoked tokens are rejected before touching the database
+    if revocation_cache.is_revoked(token):
+        logger.warning(f"Token claim failed: Token revoked")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token has been revoked"
+        )
     
-    if not session_token:
+    # Fetch only the token and credential columns used below in one query
+    row = db.execute(
+        select(
+            SessionToken.id,
+            SessionToken.credential_id,
+            SessionToken.contractor_email,
+            SessionToken.allowed_ip,
+            SessionToken.expires_at,
+            SessionToken.is_revoked,
+            SessionToken.target_url,
+            SessionToken.use_count,
+            Credential.name.label("credential_name"),
+            Credential.username,
+            Credential.encrypted_password,
+        )
+        .outerjoin(Credential, Credential.id == SessionToken.credential_id)
+        .where(SessionToken.token == token)
+    ).one_or_none()
+    
+    if not row:
         logger.warning(f"Token claim failed: Token not found")
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Token not found"
         )
     
+    now = datetime.now(timezone.utc)
+    target_url = row.target_url or f"session:{row.credential_id}"
+    
     # Check token validity
-    if not session_token.is_valid():
-        if session_token.is_revoked:
-            logger.warning(f"Token claim failed: Token revoked")
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Token has been revoked"
-            )
-        else:
-            # Log expiration
-            audit_context = get_audit_context(request)
-            audit_service.log(
-                actor=session_token.contractor_email,
-                action=AuditAction.SESSION_EXPIRED,
-                target_resource=session_token.credential.target_url,
-                ip_address=audit_context["client_ip"],
-                extra_data={"token_id": session_token.id},
-                description=f"Attempted to use expired token"
-            )
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Token has expired"
-            )
+    if row.is_revoked:
+        revocation_cache.mark_revoked(token, row.expires_at)
+        logger.warning(f"Token claim failed: Token revoked")
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token has been revoked"
+        )
+    
+    if _as_utc(row.expires_at) <= now:
+        # Log expiration
+        audit_context = get_audit_context(request)
+        audit_service.log(
+            actor=row.contractor_email,
+            action=AuditAction.SESSION_EXPIRED,
+            target_resource=target_url,
+            ip_address=audit_context["client_ip"],
+            extra_data={"token_id": row.id},
+            description=f"Attempted to use expired token"
+        )
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token has expired"
+        )
 
     # IP Whitelist Validation
-    if session_token.allowed_ip:
+    if row.allowed_ip:
         audit_context = get_audit_context(request)
         client_ip = audit_context["client_ip"]
         
-        if client_ip != session_token.allowed_ip and client_ip != "unknown":
-            logger.warning(f"IP mismatch for token {session_token.id}. Expected {session_token.allowed_ip}, got {client_ip}")
+        if client_ip != row.allowed_ip and client_ip != "unknown":
+            logger.warning(f"IP mismatch for token {row.id}. Expected {row.allowed_ip}, got {client_ip}")
             audit_service.log(
-                actor=session_token.contractor_email,
+                actor=row.contractor_email,
                 action=AuditAction.SECURITY_ALERT,
-                target_resource=session_token.credential.target_url,
+                target_resource=target_url,
                 ip_address=client_ip,
-                extra_data={"expected_ip": session_token.allowed_ip, "token_id": session_token.id},
-                description=f"Blocked access from unauthorized IP {client_ip} (Allowed: {session_token.allowed_ip})"
+                extra_data={"expected_ip": row.allowed_ip, "token_id": row.id},
+                description=f"Blocked access from unauthorized IP {client_ip} (Allowed: {row.allowed_ip})"
             )
-            # Send Discord alert
+            # Send Discord alert. Background tasks are dropped when the
+            # request ends in an exception, so run it on the event loop here.
             try:
                 discord = get_discord_service()
-                await discord.notify_security_alert(
-                   alert_type="IP Whitelist Mismatch",
-                   details=f"User {session_token.contractor_email} attempted access from {client_ip} (Allowed: {session_token.allowed_ip})"
+                from_thread.run(
+                    functools.partial(
+                        discord.notify_security_alert,
+                        alert_type="IP Whitelist Mismatch",
+                        details=f"User {row.contractor_email} attempted access from {client_ip} (Allowed: {row.allowed_ip})"
+                    )
                 )
             except Exception:
                 pass # Don't block on discord error
@@ -315,52 +363,69 @@ async def claim_token(
                 detail="Access denied from this IP address"
             )
     
-    credential = session_token.credential
+    # Stored-session tokens are claimed through /api/sessions instead
+    if row.credential_name is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Credential not found"
+        )
     
-    # Update usage tracking
-    session_token.last_used_at = datetime.now(timezone.utc)
-    session_token.use_count += 1
-    db.commit()
+    # First use is decided in the database rather than from the buffered
+    # counters: only one claim, on any worker, can move last_used_at off
+    # NULL. Committed together with the audit entry below.
+    first_use = db.execute(
+        update(SessionToken)
+        .where(SessionToken.id == row.id, SessionToken.last_used_at.is_(None))
+        .values(last_used_at=now)
+        .returning(SessionToken.id)
+        .execution_options(synchronize_session=False)
+    ).first() is not None
+    
+    # Update usage tracking (written behind in batches). The count below is
+    # approximate: it only adds this worker's unflushed uses, and a flush
+    # may land between the read above and this call.
+    use_count = row.use_count + get_usage_buffer().record(row.id, now)
     
     # Log successful injection
     audit_context = get_audit_context(request)
     audit_service.log(
-        actor=session_token.contractor_email,
+        actor=row.contractor_email,
         action=AuditAction.INJECTION_SUCCESS,
-        target_resource=credential.target_url,
+        target_resource=row.target_url,
         ip_address=audit_context["client_ip"],
         extra_data={
-            "token_id": session_token.id,
-            "use_count": session_token.use_count,
+            "token_id": row.id,
+            "use_count": use_count,
             "user_agent": audit_context["user_agent"],
         },
-        description=f"Credential injected for {credential.name}"
+        description=f"Credential injected for {row.credential_name}"
     )
     
     # Return encrypted password (base64 encoded for JSON transport)
-    encrypted_password_b64 = base64.b64encode(credential.encrypted_password).decode("utf-8")
+    encrypted_password_b64 = base64.b64encode(row.encrypted_password).decode("utf-8")
     
     logger.info(
-        f"Token claimed: {session_token.contractor_email} accessed {credential.name} "
-        f"(use #{session_token.use_count})"
+        f"Token claimed: {row.contractor_email} accessed {row.credential_name} "
+        f"(use #{use_count})"
     )
     
     # Send Discord notification (only on first use)
-    if session_token.use_count == 1:
+    if first_use:
         discord = get_discord_service()
-        await discord.notify_access_claimed(
-            contractor_email=session_token.contractor_email,
-            credential_name=credential.name,
+        background_tasks.add_task(
+            discord.notify_access_claimed,
+            contractor_email=row.contractor_email,
+            credential_name=row.credential_name,
             ip_address=audit_context["client_ip"],
         )
     
     return ClaimTokenResponse(
         success=True,
-        credential_name=credential.name,
-        target_url=credential.target_url,
-        username=credential.username,
+        credential_name=row.credential_name,
+        target_url=row.target_url,
+        username=row.username,
         encrypted_password=encrypted_password_b64,
-        expires_at=session_token.expires_at,
+        expires_at=row.expires_at,
     )
 
 
@@ -368,7 +433,7 @@ async def claim_token(
     "/validate/{token}",
     summary="Check if a token is still valid (for extension polling)"
 )
-async def validate_token(
+def validate_token(
     token: str,
     db: Annotated[Session, Depends(get_db)],
 ):
@@ -376,6 +441,9 @@ async def validate_token(
     Lightweight endpoint for the extension to poll status.
     Returns { valid: bool, status: str }
     """
+    if revocation_cache.is_revoked(token):
+        return {"valid": False, "status": "revoked"}
+    
     token_obj = db.query(SessionToken).filter(SessionToken.token == token).first()
     
     if not token_obj:
@@ -396,10 +464,11 @@ async def validate_token(
     response_model=RevokeResponse,
     summary="Revoke a specific access token"
 )
-async def revoke_token(
+def revoke_token(
     request: Request,
     token_id: str,
     payload: RevokeTokenRequest,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     audit_service: Annotated[AuditService, Depends(get_audit_service)],
 ):
@@ -409,17 +478,28 @@ async def revoke_token(
     - Marks token as revoked
     - Logs REVOKE_ACCESS to audit trail
     """
-    session_token = db.query(SessionToken).filter(
-        SessionToken.id == token_id
-    ).first()
+    row = db.execute(
+        select(
+            SessionToken.id,
+            SessionToken.token,
+            SessionToken.credential_id,
+            SessionToken.contractor_email,
+            SessionToken.expires_at,
+            SessionToken.is_revoked,
+            SessionToken.target_url,
+            Credential.name.label("credential_name"),
+        )
+        .outerjoin(Credential, Credential.id == SessionToken.credential_id)
+        .where(SessionToken.id == token_id)
+    ).one_or_none()
     
-    if not session_token:
+    if not row:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Token not found"
         )
     
-    if session_token.is_revoked:
+    if row.is_revoked:
         return RevokeResponse(
             success=True,
             revoked_count=0,
@@ -427,15 +507,21 @@ async def revoke_token(
         )
     
     # Revoke the token
-    session_token.is_revoked = True
-    session_token.revoked_at = datetime.now(timezone.utc)
-    session_token.revoked_by = payload.admin_email
+    db.execute(
+        update(SessionToken)
+        .where(SessionToken.id == row.id)
+        .values(
+            is_revoked=True,
+            revoked_at=datetime.now(timezone.utc),
+            revoked_by=payload.admin_email,
+        )
+    )
     db.commit()
+    revocation_cache.mark_revoked(row.token, row.expires_at)
     
-    # Get resource info (handle both Credential and StoredSession tokens)
-    credential = db.query(Credential).filter(Credential.id == session_token.credential_id).first()
-    credential_name = credential.name if credential else "Session"
-    target_url = credential.target_url if credential else f"session:{session_token.credential_id}"
+    # Resource info (handle both Credential and StoredSession tokens)
+    credential_name = row.credential_name or "Session"
+    target_url = row.target_url or f"session:{row.credential_id}"
     
     # Log revocation
     audit_context = get_audit_context(request)
@@ -445,34 +531,32 @@ async def revoke_token(
         target_resource=target_url,
         ip_address=audit_context["client_ip"],
         extra_data={
-            "token_id": session_token.id,
-            "contractor_email": session_token.contractor_email,
+            "token_id": row.id,
+            "contractor_email": row.contractor_email,
             "reason": payload.reason,
         },
-        description=f"Revoked access for {session_token.contractor_email} to {credential_name}"
+        description=f"Revoked access for {row.contractor_email} to {credential_name}"
     )
     
     logger.warning(
-        f"Token revoked: {token_id} for {session_token.contractor_email} "
+        f"Token revoked: {token_id} for {row.contractor_email} "
         f"by {payload.admin_email}"
     )
     
-    # Send Discord notification
-    try:
-        discord = get_discord_service()
-        await discord.notify_access_revoked(
-            contractor_email=session_token.contractor_email,
-            credential_name=credential_name,
-            admin_email=payload.admin_email,
-            reason=payload.reason,
-        )
-    except Exception as e:
-        logger.error(f"Failed to send discord notification: {e}")
+    # Send Discord notification after the response is sent
+    discord = get_discord_service()
+    background_tasks.add_task(
+        discord.notify_access_revoked,
+        contractor_email=row.contractor_email,
+        credential_name=credential_name,
+        admin_email=payload.admin_email,
+        reason=payload.reason,
+    )
     
     return RevokeResponse(
         success=True,
         revoked_count=1,
-        message=f"Successfully revoked token for {session_token.contractor_email}"
+        message=f"Successfully revoked token for {row.contractor_email}"
     )
 
 
@@ -481,10 +565,11 @@ async def revoke_token(
     response_model=RevokeResponse,
     summary="Revoke ALL active tokens for a contractor (Kill Switch)"
 )
-async def revoke_all_tokens(
+def revoke_all_tokens(
     request: Request,
     contractor_email: str,
     payload: RevokeAllRequest,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     audit_service: Annotated[AuditService, Depends(get_audit_service)],
 ):
@@ -500,10 +585,19 @@ async def revoke_all_tokens(
     now = datetime.now(timezone.utc)
     
     # Find all active tokens for this contractor
-    active_tokens = db.query(SessionToken).filter(
-        SessionToken.contractor_email == contractor_email,
-        SessionToken.is_revoked == False,
-        SessionToken.expires_at > now
+    active_tokens = db.execute(
+        select(
+            SessionToken.id,
+            SessionToken.token,
+            SessionToken.credential_id,
+            SessionToken.expires_at,
+            SessionToken.target_url,
+        )
+        .where(
+            SessionToken.contractor_email == contractor_email,
+            SessionToken.is_revoked == False,
+            SessionToken.expires_at > now
+        )
     ).all()
     
     if not active_tokens:
@@ -514,14 +608,18 @@ async def revoke_all_tokens(
         )
     
     # Revoke all tokens
-    revoked_credentials = set()
-    for token in active_tokens:
-        token.is_revoked = True
-        token.revoked_at = now
-        token.revoked_by = payload.admin_email
-        revoked_credentials.add(token.credential.target_url)
-    
+    db.execute(
+        update(SessionToken)
+        .where(SessionToken.id.in_([t.id for t in active_tokens]))
+        .values(is_revoked=True, revoked_at=now, revoked_by=payload.admin_email)
+    )
     db.commit()
+    for t in active_tokens:
+        revocation_cache.mark_revoked(t.token, t.expires_at)
+    
+    revoked_credentials = {
+        t.target_url or f"session:{t.credential_id}" for t in active_tokens
+    }
     
     # Log high-priority revocation (KILL SWITCH)
     audit_context = get_audit_context(request)
@@ -545,9 +643,10 @@ async def revoke_all_tokens(
         f"for {contractor_email} by {payload.admin_email}"
     )
     
-    # Send Discord notification
+    # Send Discord notification after the response is sent
     discord = get_discord_service()
-    await discord.notify_kill_switch(
+    background_tasks.add_task(
+        discord.notify_kill_switch,
         contractor_email=contractor_email,
         revoked_count=len(active_tokens),
         admin_email=payload.admin_email,
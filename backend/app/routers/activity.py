@@ -3,19 +3,45 @@ Activity Router - URL Traversal Logging
 Endpoints for logging and retrieving session activity.
 """
 import logging
+import re
+import uuid
 from datetime import datetime, timezone
 from typing import Annotated
 from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import column, exists, func, select, tuple_, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, raiseload
 from pydantic import BaseModel
 
 from app.database import get_db
 from app.models import SessionToken, SessionActivity
+from app.utils.responses import ORJSONResponse
 
 logger = logging.getLogger("contractor_vault.activity")
 
 router = APIRouter(prefix="/api/activity", tags=["Activity Logging"])
 
+# Splits an absolute URL into network location and path
+# ("https://host:port/a/b?q=1" -> "host:port", "/a/b")
+_URL_RE = re.compile(r"^[^/]+//([^/?#]*)([^?#]*)")
+
+# Number of navigation steps returned in the activity summary
+SUMMARY_PATH_LIMIT = 20
+
+# Columns written by log_activity's INSERT ... SELECT
+_ACTIVITY_INSERT_COLUMNS = (
+    "id",
+    "session_token_id",
+    "url",
+    "url_hash",
+    "title",
+    "transition_type",
+    "referrer_url",
+    "timestamp",
+    "duration_ms",
+)
+
 
 # ===== Schemas =====
 
@@ -50,8 +76,8 @@ class ActivityResponse(BaseModel):
 
 # ===== Endpoints =====
 
-@router.post("/log", status_code=status.HTTP_201_CREATED)
-async def log_activity(
+@router.post("/log", status_code=status.HTTP_201_CREATED, response_class=ORJSONResponse)
+def log_activity(
     batch: ActivityBatch,
     request: Request,
     db: Session = Depends(get_db),
@@ -79,30 +105,48 @@ async def log_activity(
             detail="Session has been revoked"
         )
     
-    # Store each activity
+    # Store all activities in one statement. A URL is skipped when the token
+    # already has it logged at the same or a later time (so re-sent and
+    # out-of-order batches are not stored again); exact repeats within the
+    # batch are dropped by the uix_activity_url_hash_dedup unique index.
+    rows = [
+        {
+            "id": str(uuid.uuid4()),
+            "session_token_id": session_token.id,
+            "url": activity.url,
+            "url_hash": SessionActivity.hash_url(activity.url),
+            "title": activity.title,
+            "transition_type": activity.transition_type,
+            "referrer_url": activity.referrer_url,
+            "timestamp": activity.timestamp if activity.timestamp.tzinfo else activity.timestamp.replace(tzinfo=timezone.utc),
+            "duration_ms": activity.duration_ms,
+        }
+        for activity in batch.activities
+    ]
+    
     logged_count = 0
-    for activity in batch.activities:
-        # Skip duplicate URLs in quick succession (debounce)
-        existing = db.query(SessionActivity).filter(
-            SessionActivity.session_token_id == session_token.id,
-            SessionActivity.url == activity.url,
-            SessionActivity.timestamp >= activity.timestamp
-        ).first()
-        
-        if existing:
-            continue
-        
-        session_activity = SessionActivity(
-            session_token_id=session_token.id,
-            url=activity.url,
-            title=activity.title,
-            transition_type=activity.transition_type,
-            referrer_url=activity.referrer_url,
-            timestamp=activity.timestamp if activity.timestamp.tzinfo else activity.timestamp.replace(tzinfo=timezone.utc),
-            duration_ms=activity.duration_ms,
+    if rows:
+        table = SessionActivity.__table__
+        incoming = values(
+            *(column(name, table.c[name].type) for name in _ACTIVITY_INSERT_COLUMNS),
+            name="incoming",
+        ).data([tuple(row[name] for name in _ACTIVITY_INSERT_COLUMNS) for row in rows]).cte("incoming")
+        already_logged = exists().where(
+            table.c.session_token_id == incoming.c.session_token_id,
+            table.c.url_hash == incoming.c.url_hash,
+            table.c.timestamp >= incoming.c.timestamp,
+        )
+        dialect_insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        result = db.execute(
+            dialect_insert(table).from_select(
+                _ACTIVITY_INSERT_COLUMNS,
+                select(*incoming.c).where(~already_logged),
+            ).on_conflict_do_nothing(
+                index_elements=["session_token_id", "url_hash", "timestamp"]
+            ).returning(table.c.id)
         )
-        db.add(session_activity)
-        logged_count += 1
+        # Counted from RETURNING; rowcount is not reported for WITH ... INSERT
+        logged_count = len(result.all())
     
     db.commit()
     
@@ -116,16 +160,28 @@ async def log_activity(
 
 
 @router.get("/{token_id}", response_model=list[ActivityResponse])
-async def get_session_activity(
+def get_session_activity(
     token_id: str,
     db: Session = Depends(get_db),
     limit: int = 100,
+    since: datetime | None = None,
+    since_id: str | None = None,
 ):
     """
     Get all activity for a specific session token.
     
     Used by the dashboard to show URL traversal timeline.
+    Pass the timestamp and id of the last item received as `since` and
+    `since_id` to fetch the next page; several activities can share a
+    timestamp, so the id keeps a page boundary from skipping any of them.
+    `since` alone still returns only strictly later activities.
     """
+    if since_id is not None and since is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since_id requires since"
+        )
+    
     # Verify token exists
     session_token = db.query(SessionToken).filter(
         SessionToken.id == token_id
@@ -137,16 +193,26 @@ async def get_session_activity(
             detail="Session token not found"
         )
     
-    # Get activities ordered by timestamp
-    activities = db.query(SessionActivity).filter(
+    # Keyset pagination on (timestamp, id), walking ix_session_activities_token_timestamp_id
+    query = db.query(SessionActivity).options(raiseload("*")).filter(
         SessionActivity.session_token_id == token_id
-    ).order_by(SessionActivity.timestamp.asc()).limit(limit).all()
+    )
+    if since_id is not None:
+        query = query.filter(
+            tuple_(SessionActivity.timestamp, SessionActivity.id) > (since, since_id)
+        )
+    elif since is not None:
+        query = query.filter(SessionActivity.timestamp > since)
+    
+    activities = query.order_by(
+        SessionActivity.timestamp.asc(), SessionActivity.id.asc()
+    ).limit(limit).all()
     
     return activities
 
 
-@router.get("/summary/{token_id}")
-async def get_activity_summary(
+@router.get("/summary/{token_id}", response_class=ORJSONResponse)
+def get_activity_summary(
     token_id: str,
     db: Session = Depends(get_db),
 ):
@@ -165,11 +231,16 @@ async def get_activity_summary(
             detail="Session token not found"
         )
     
-    activities = db.query(SessionActivity).filter(
+    # Count and time bounds come straight from SQL
+    total_pages, first_ts, last_ts = db.query(
+        func.count(SessionActivity.id),
+        func.min(SessionActivity.timestamp),
+        func.max(SessionActivity.timestamp),
+    ).filter(
         SessionActivity.session_token_id == token_id
-    ).order_by(SessionActivity.timestamp.asc()).all()
+    ).one()
     
-    if not activities:
+    if not total_pages:
         return {
             "total_pages": 0,
             "unique_domains": [],
@@ -177,34 +248,44 @@ async def get_activity_summary(
             "path_summary": []
         }
     
-    # Extract unique domains
-    from urllib.parse import urlparse
+    # Extract unique domains from distinct URLs only
+    distinct_urls = db.query(SessionActivity.url).filter(
+        SessionActivity.session_token_id == token_id
+    ).distinct()
     domains = set()
-    path_summary = []
+    for (url,) in distinct_urls:
+        match = _URL_RE.match(url)
+        if match:
+            domains.add(match.group(1))
+    
+    # Only the first 20 rows are needed for the summary
+    first_activities = db.query(
+        SessionActivity.url,
+        SessionActivity.title,
+        SessionActivity.timestamp,
+    ).filter(
+        SessionActivity.session_token_id == token_id
+    ).order_by(SessionActivity.timestamp.asc()).limit(SUMMARY_PATH_LIMIT).all()
     
-    for activity in activities:
-        try:
-            parsed = urlparse(activity.url)
-            domains.add(parsed.netloc)
-            # Create simplified path
-            path = parsed.path[:50] + "..." if len(parsed.path) > 50 else parsed.path
-            path_summary.append({
-                "domain": parsed.netloc,
-                "path": path,
-                "title": activity.title or parsed.path,
-                "timestamp": activity.timestamp.isoformat()
-            })
-        except:
-            pass
+    path_summary = []
+    for url, title, timestamp in first_activities:
+        match = _URL_RE.match(url)
+        domain, full_path = match.groups() if match else ("", url)
+        # Create simplified path
+        path = full_path[:50] + "..." if len(full_path) > 50 else full_path
+        path_summary.append({
+            "domain": domain,
+            "path": path,
+            "title": title or full_path,
+            "timestamp": timestamp.isoformat()
+        })
     
     # Calculate session duration
-    first_ts = activities[0].timestamp
-    last_ts = activities[-1].timestamp
     duration = (last_ts - first_ts).total_seconds()
     
     return {
-        "total_pages": len(activities),
+        "total_pages": total_pages,
         "unique_domains": list(domains),
         "duration_seconds": int(duration),
-        "path_summary": path_summary[:20]  # Limit to 20 for summary
+        "path_summary": path_summary
     }
@@ -3,7 +3,7 @@ Contractor Vault - Analytics Router
 Provides aggregated statistics and trends for the admin dashboard
 """
 from datetime import datetime, timezone, timedelta
-from sqlalchemy import func, desc
+from sqlalchemy import DateTime, String, and_, bindparam, case, desc, func, select, true
 from sqlalchemy.orm import Session
 from fastapi import APIRouter, Depends
 
@@ -11,12 +11,71 @@ from app.database import get_db
 from app.models import SessionToken, AuditLog, Credential, AuditAction
 from app.routers.auth import require_auth
 from app.models.user import User
+from app.utils.responses import ORJSONResponse
 
-router = APIRouter(prefix="/api/analytics", tags=["Analytics"])
+router = APIRouter(
+    prefix="/api/analytics",
+    tags=["Analytics"],
+    default_response_class=ORJSONResponse,
+)
+
+
+def _build_summary_stmt():
+    """
+    Build the dashboard summary query once, with bound parameters for the
+    per-request values (:email, :now, :since), so the compiled statement
+    is reused from SQLAlchemy's cache on every request.
+    """
+    email = bindparam("email", type_=String)
+    now = bindparam("now", type_=DateTime(timezone=True))
+    since = bindparam("since", type_=DateTime(timezone=True))
+    
+    # Token stats - filter by current user
+    token_stats = select(
+        func.count().label("total_tokens"),
+        func.count(case(
+            (and_(SessionToken.is_revoked == False, SessionToken.expires_at > now), 1)
+        )).label("active_tokens"),
+        func.count(case((SessionToken.is_revoked == True, 1))).label("revoked_tokens"),
+    ).where(
+        SessionToken.created_by == email
+    ).subquery()
+    
+    # Credential stats (shared across all users for now)
+    credential_stats = select(
+        func.count().label("total_credentials"),
+    ).where(
+        Credential.is_active == True
+    ).subquery()
+    
+    # Activity stats for current user (last 24h)
+    activity_stats = select(
+        func.count(case((AuditLog.action == AuditAction.GRANT_ACCESS, 1))).label("grants_24h"),
+        func.count(case((AuditLog.action == AuditAction.INJECTION_SUCCESS, 1))).label("injections_24h"),
+        func.count(case((AuditLog.action == AuditAction.REVOKE_ACCESS, 1))).label("revokes_24h"),
+    ).where(
+        AuditLog.actor == email,
+        AuditLog.timestamp >= since,
+        AuditLog.action.in_([
+            AuditAction.GRANT_ACCESS,
+            AuditAction.INJECTION_SUCCESS,
+            AuditAction.REVOKE_ACCESS,
+        ]),
+    ).subquery()
+    
+    # All three single-row aggregates in one round trip
+    return select(token_stats, credential_stats, activity_stats).select_from(
+        token_stats
+        .join(credential_stats, true())
+        .join(activity_stats, true())
+    )
+
+
+SUMMARY_STMT = _build_summary_stmt()
 
 
 @router.get("/summary")
-async def get_analytics_summary(
+def get_analytics_summary(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_auth)
 ):
@@ -26,42 +85,18 @@ async def get_analytics_summary(
     now = datetime.now(timezone.utc)
     last_24h = now - timedelta(hours=24)
     
-    # Token stats - filter by current user
-    user_tokens = db.query(SessionToken).filter(
-        SessionToken.created_by == current_user.email
-    )
-    
-    total_tokens = user_tokens.count()
-    active_tokens = user_tokens.filter(
-        SessionToken.is_revoked == False,
-        SessionToken.expires_at > now
-    ).count()
-    revoked_tokens = db.query(SessionToken).filter(
-        SessionToken.created_by == current_user.email,
-        SessionToken.is_revoked == True
-    ).count()
-    
-    # Credential stats (shared across all users for now)
-    total_credentials = db.query(Credential).filter(Credential.is_active == True).count()
-    
-    # Activity stats for current user (last 24h)
-    grants_24h = db.query(AuditLog).filter(
-        AuditLog.actor == current_user.email,
-        AuditLog.action == AuditAction.GRANT_ACCESS,
-        AuditLog.timestamp >= last_24h
-    ).count()
-    
-    injections_24h = db.query(AuditLog).filter(
-        AuditLog.actor == current_user.email,
-        AuditLog.action == AuditAction.INJECTION_SUCCESS,
-        AuditLog.timestamp >= last_24h
-    ).count()
+    stats = db.execute(
+        SUMMARY_STMT,
+        {"email": current_user.email, "now": now, "since": last_24h},
+    ).one()
     
-    revokes_24h = db.query(AuditLog).filter(
-        AuditLog.actor == current_user.email,
-        AuditLog.action == AuditAction.REVOKE_ACCESS,
-        AuditLog.timestamp >= last_24h
-    ).count()
+    total_tokens = stats.total_tokens
+    active_tokens = stats.active_tokens
+    revoked_tokens = stats.revoked_tokens
+    total_credentials = stats.total_credentials
+    grants_24h = stats.grants_24h
+    injections_24h = stats.injections_24h
+    revokes_24h = stats.revokes_24h
     
     return {
         "tokens": {
@@ -82,7 +117,7 @@ async def get_analytics_summary(
 
 
 @router.get("/top-contractors")
-async def get_top_contractors(
+def get_top_contractors(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_auth),
     limit: int = 10
@@ -113,7 +148,7 @@ async def get_top_contractors(
 
 
 @router.get("/activity-timeline")
-async def get_activity_timeline(
+def get_activity_timeline(
     db: Session = Depends(get_db),
     days: int = 7
 ):
@@ -151,7 +186,7 @@ async def get_activity_timeline(
 
 
 @router.get("/recent-activity")
-async def get_recent_activity(
+def get_recent_activity(
     db: Session = Depends(get_db),
     limit: int = 20
 ):
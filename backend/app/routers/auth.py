@@ -1,25 +1,44 @@
 """
 Authentication router for email OTP login
 """
+import hashlib
+import hmac
 import logging
+import threading
+import time
+from string import Template
 from datetime import datetime, timezone, timedelta
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel, EmailStr, Field
+from sqlalchemy import delete, update
 from sqlalchemy.orm import Session
+from cachetools import TTLCache
 import jwt
+from jwt.algorithms import HMACAlgorithm
 
 from app.database import get_db
 from app.config import get_settings
-from app.models.user import User, OTPCode
+from app.models.user import User, OTPCode, PasswordResetToken
 from app.services.email_service import get_email_service
 from app.utils.rate_limiter import limiter
+from app.utils.responses import ORJSONResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 security = HTTPBearer(auto_error=False)
 
+# Settings are immutable after startup; resolve what the hot paths need once
+_SETTINGS = get_settings()
+# HS256 key is prepared once instead of on every encode/decode
+_JWT_KEY = HMACAlgorithm(HMACAlgorithm.SHA256).prepare_key(_SETTINGS.jwt_secret)
+_JWT_ALG = "HS256"
+_JWT_ALGS = [_JWT_ALG]
+# Shared admin password for the password-login fallback, pre-encoded for
+# hmac.compare_digest (None when the fallback is disabled)
+_ADMIN_PASSWORD_BYTES = _SETTINGS.admin_password.encode() if _SETTINGS.admin_password else None
+
 
 # ===== SCHEMAS =====
 
@@ -65,35 +84,90 @@ class PasswordLoginResponse(BaseModel):
 
 # ===== HELPERS =====
 
+def _jwt_encode(payload: dict) -> str:
+    """Sign a payload as an HS256 JWT."""
+    return jwt.encode(payload, _JWT_KEY, algorithm=_JWT_ALG)
+
+
+def _jwt_decode(token: str) -> Optional[dict]:
+    """Verify an HS256 JWT and return its claims, or None if invalid or expired."""
+    try:
+        return jwt.decode(token, _JWT_KEY, algorithms=_JWT_ALGS)
+    except jwt.ExpiredSignatureError:
+        return None
+    except jwt.InvalidTokenError:
+        return None
+
+
 def create_auth_token(user_id: str, email: str) -> str:
     """Create JWT token for authenticated user."""
-    settings = get_settings()
+    now = datetime.now(timezone.utc)
     payload = {
         "sub": user_id,
         "email": email,
-        "iat": datetime.now(timezone.utc),
-        "exp": datetime.now(timezone.utc) + timedelta(days=7)
+        "iat": now,
+        "exp": now + timedelta(days=7)
     }
-    return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
+    return _jwt_encode(payload)
+
+
+# Payloads of successfully verified tokens, keyed by a hash of the token.
+# Entries are also checked against the token's own exp claim on every hit.
+_JWT_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+_JWT_CACHE_LOCK = threading.Lock()
 
 
 def decode_auth_token(token: str) -> Optional[dict]:
     """Decode and validate JWT token."""
-    settings = get_settings()
-    try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
-        return payload
-    except jwt.ExpiredSignatureError:
+    cache_key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    
+    with _JWT_CACHE_LOCK:
+        payload = _JWT_CACHE.get(cache_key)
+    if payload is not None:
+        if payload["exp"] > time.time():
+            return payload
+        with _JWT_CACHE_LOCK:
+            _JWT_CACHE.pop(cache_key, None)
         return None
-    except jwt.InvalidTokenError:
+    
+    payload = _jwt_decode(token)
+    if payload is None:
         return None
+    
+    # Only verified tokens are cached; failures are re-checked every time
+    if "exp" in payload:
+        with _JWT_CACHE_LOCK:
+            _JWT_CACHE[cache_key] = payload
+    return payload
+
 
+# Read-only snapshot of recently authenticated users, keyed by user id.
+# Writes made through this process (login, password, promotion) drop the
+# entry at once. Writes made anywhere else (other workers, scripts, direct
+# SQL) are only seen once the entry expires, so each worker may act on a
+# stale snapshot for up to USER_CACHE_TTL_SECONDS. Superusers and inactive
+# users are never cached, so demotions and reactivations always read the row.
+USER_CACHE_TTL_SECONDS = 60
+_USER_CACHE: TTLCache = TTLCache(maxsize=10_000, ttl=USER_CACHE_TTL_SECONDS)
+_USER_CACHE_LOCK = threading.Lock()
 
-async def get_current_user(
+
+def _invalidate_cached_user(user_id: str) -> None:
+    """Drop a user from the auth cache after writing to their row."""
+    with _USER_CACHE_LOCK:
+        _USER_CACHE.pop(user_id, None)
+
+
+def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
 ) -> Optional[User]:
-    """Get current authenticated user from JWT token."""
+    """
+    Get current authenticated user from JWT token.
+    
+    The returned User may be a detached snapshot; callers must treat it
+    as read-only.
+    """
     if not credentials:
         return None
     
@@ -101,11 +175,27 @@ async def get_current_user(
     if not payload:
         return None
     
-    user = db.query(User).filter(User.id == payload.get("sub")).first()
+    user_id = payload.get("sub")
+    with _USER_CACHE_LOCK:
+        cached = _USER_CACHE.get(user_id)
+    if cached is not None:
+        return User(**cached)
+    
+    user = db.query(User).filter(User.id == user_id).first()
+    if user and user.is_active and not user.is_superuser:
+        with _USER_CACHE_LOCK:
+            _USER_CACHE[user_id] = {
+                "id": user.id,
+                "email": user.email,
+                "created_at": user.created_at,
+                "last_login": user.last_login,
+                "is_active": user.is_active,
+                "is_superuser": user.is_superuser,
+            }
     return user
 
 
-async def require_auth(
+def require_auth(
     user: Optional[User] = Depends(get_current_user)
 ) -> User:
     """Require authenticated user."""
@@ -120,32 +210,41 @@ async def require_auth(
 
 # ===== ENDPOINTS =====
 
+async def _send_otp_bg(email: str, code: str) -> None:
+    """Deliver an OTP email after the response has been sent."""
+    email_service = get_email_service()
+    sent = await email_service.send_otp(email, code)
+    
+    if not sent:
+        logger.error(f"Failed to send OTP to {email}")
+
+
 @router.post("/request-otp", response_model=RequestOTPResponse)
-async def request_otp(
+@limiter.limit("5/minute")
+def request_otp(
+    request: Request,
     payload: RequestOTPRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Request OTP code to be sent to email."""
     email = payload.email.lower().strip()
     
-    # Invalidate any existing OTP codes for this email
+    # Invalidate any existing OTP codes for this email (none are loaded in
+    # this session, so skip ORM synchronization)
     db.query(OTPCode).filter(
         OTPCode.email == email,
         OTPCode.used == False
-    ).update({"used": True})
+    ).update({"used": True}, synchronize_session=False)
     
     # Create new OTP
     otp = OTPCode.create(email)
     db.add(otp)
     db.commit()
     
-    # Send email
-    email_service = get_email_service()
-    sent = await email_service.send_otp(email, otp.code)
-    
-    if not sent:
-        logger.error(f"Failed to send OTP to {email}")
-        # Still return success to not leak info about email sending
+    # Send email in the background; the response is the same either way
+    # so it does not leak whether sending succeeded
+    background_tasks.add_task(_send_otp_bg, email, otp.code)
     
     logger.info(f"OTP requested for {email}")
     
@@ -161,59 +260,68 @@ async def verify_otp(
     db: Session = Depends(get_db)
 ):
     """Verify OTP code and return authentication token."""
+    now = datetime.now(timezone.utc)
     email = payload.email.lower().strip()
     code = payload.code.strip()
     
-    # Find valid OTP
-    otp = db.query(OTPCode).filter(
-        OTPCode.email == email,
-        OTPCode.code == code,
-        OTPCode.used == False
-    ).order_by(OTPCode.created_at.desc()).first()
+    # Find and consume a valid OTP in one statement, so concurrent
+    # requests cannot both redeem the same code
+    otp_id = db.execute(
+        update(OTPCode)
+        .where(
+            OTPCode.email == email,
+            OTPCode.code == code,
+            OTPCode.used == False,
+            OTPCode.expires_at > now
+        )
+        .values(used=True)
+        .returning(OTPCode.id)
+        .execution_options(synchronize_session=False)
+    ).first()
     
-    if not otp or not otp.is_valid():
+    if otp_id is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid or expired verification code"
         )
     
-    # Mark OTP as used
-    otp.used = True
-    
     # Get or create user
     user = db.query(User).filter(User.email == email).first()
     if not user:
         user = User(
             id=User.generate_id(),
             email=email,
-            created_at=datetime.now(timezone.utc)
+            created_at=now
         )
         db.add(user)
     
-    user.last_login = datetime.now(timezone.utc)
+    user.last_login = now
     db.commit()
+    _invalidate_cached_user(user.id)
     
     # Create token
     token = create_auth_token(user.id, user.email)
     
     logger.info(f"User {email} authenticated successfully")
     
-    return VerifyOTPResponse(
-        success=True,
-        token=token,
-        user={"id": user.id, "email": user.email},
-        message="Authentication successful"
-    )
+    # Same shape as VerifyOTPResponse, serialized directly
+    return ORJSONResponse({
+        "success": True,
+        "token": token,
+        "user": {"id": user.id, "email": user.email},
+        "message": "Authentication successful",
+    })
 
 
 @router.get("/me", response_model=CurrentUserResponse)
 async def get_me(user: User = Depends(require_auth)):
     """Get current authenticated user."""
-    return CurrentUserResponse(
-        id=user.id,
-        email=user.email,
-        created_at=user.created_at
-    )
+    # Same shape as CurrentUserResponse, serialized directly
+    return ORJSONResponse({
+        "id": user.id,
+        "email": user.email,
+        "created_at": user.created_at,
+    })
 
 
 @router.post("/password-login", response_model=PasswordLoginResponse)
@@ -224,7 +332,7 @@ async def password_login(
     db: Session = Depends(get_db)
 ):
     """Login with email and password."""
-    settings = get_settings()
+    now = datetime.now(timezone.utc)
     email = payload.email.lower().strip()
     password = payload.password
     
@@ -240,14 +348,13 @@ async def password_login(
             )
     else:
         # Fall back to admin password for backwards compatibility
-        admin_password = getattr(settings, 'admin_password', None)
-        if not admin_password:
+        if _ADMIN_PASSWORD_BYTES is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
             )
         
-        if password != admin_password:
+        if not hmac.compare_digest(password.encode(), _ADMIN_PASSWORD_BYTES):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid email or password"
@@ -258,12 +365,13 @@ async def password_login(
             user = User(
                 id=User.generate_id(),
                 email=email,
-                created_at=datetime.now(timezone.utc)
+                created_at=now
             )
             db.add(user)
     
-    user.last_login = datetime.now(timezone.utc)
+    user.last_login = now
     db.commit()
+    _invalidate_cached_user(user.id)
     
     # Create token
     token = create_auth_token(user.id, user.email)
@@ -299,6 +407,7 @@ async def register(
     db: Session = Depends(get_db)
 ):
     """Register a new user with email and password."""
+    now = datetime.now(timezone.utc)
     email = payload.email.lower().strip()
     password = payload.password
     
@@ -320,14 +429,15 @@ async def register(
         user = User(
             id=User.generate_id(),
             email=email,
-            created_at=datetime.now(timezone.utc)
+            created_at=now
         )
         db.add(user)
     
     # Set password
     user.set_password(password)
-    user.last_login = datetime.now(timezone.utc)
+    user.last_login = now
     db.commit()
+    _invalidate_cached_user(user.id)
     
     # Create token
     token = create_auth_token(user.id, user.email)
@@ -371,38 +481,67 @@ class ResetPasswordResponse(BaseModel):
     message: str
 
 
-def create_reset_token(user_id: str, email: str) -> str:
+RESET_TOKEN_TTL = timedelta(hours=1)
+
+
+def create_reset_token(user_id: str, email: str, now: Optional[datetime] = None) -> str:
     """Create a password reset JWT token (valid for 1 hour)."""
-    settings = get_settings()
+    now = now or datetime.now(timezone.utc)
     payload = {
         "sub": user_id,
         "email": email,
         "type": "password_reset",
-        "iat": datetime.now(timezone.utc),
-        "exp": datetime.now(timezone.utc) + timedelta(hours=1)
+        "iat": now,
+        "exp": now + RESET_TOKEN_TTL
     }
-    return jwt.encode(payload, settings.jwt_secret, algorithm="HS256")
+    return _jwt_encode(payload)
 
 
 def decode_reset_token(token: str) -> Optional[dict]:
     """Decode and validate password reset token."""
-    settings = get_settings()
-    try:
-        payload = jwt.decode(token, settings.jwt_secret, algorithms=["HS256"])
-        if payload.get("type") != "password_reset":
-            return None
-        return payload
-    except jwt.ExpiredSignatureError:
-        return None
-    except jwt.InvalidTokenError:
+    payload = _jwt_decode(token)
+    if payload is None or payload.get("type") != "password_reset":
         return None
+    return payload
+
+
+# Password reset email body; only $reset_url varies per request
+_RESET_EMAIL_TEMPLATE = Template("""
+<div style="font-family: sans-serif; max-width: 600px; margin: 0 auto; background: #0f172a; padding: 40px; border-radius: 16px;">
+    <h1 style="color: #22d3ee;">ShadowKey Password Reset</h1>
+    <p style="color: #e2e8f0;">You requested a password reset for your ShadowKey account.</p>
+    <p style="color: #e2e8f0;">Click the button below to set a new password. This link expires in 1 hour.</p>
+    <div style="text-align: center; margin: 32px 0;">
+        <a href="$reset_url" style="background: linear-gradient(to right, #06b6d4, #3b82f6); color: white; padding: 16px 32px; border-radius: 8px; text-decoration: none; font-weight: bold;">Reset Password</a>
+    </div>
+    <p style="color: #94a3b8; font-size: 14px;">If you didn't request this, you can safely ignore this email.</p>
+    <p style="color: #64748b; font-size: 12px; margin-top: 32px;">ShadowKey Security Team</p>
+</div>
+""")
+
+
+async def _send_reset_email_bg(email: str, reset_url: str, reset_token: str) -> None:
+    """Deliver a password reset email after the response has been sent."""
+    try:
+        email_service = get_email_service()
+        await email_service.send_email(
+            to_email=email,
+            subject="🔐 Reset Your ShadowKey Password",
+            html_content=_RESET_EMAIL_TEMPLATE.substitute(reset_url=reset_url)
+        )
+        logger.info(f"Password reset email sent to {email}")
+    except Exception as e:
+        # If email fails, log the token for debugging (remove in production)
+        logger.error(f"Failed to send reset email: {e}")
+        logger.info(f"Password reset token for {email}: {reset_token}")
 
 
 @router.post("/request-reset", response_model=RequestResetResponse)
 @limiter.limit("3/minute")
-async def request_reset(
+def request_reset(
     request: Request,
     payload: RequestResetRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """Request a password reset email."""
@@ -419,34 +558,29 @@ async def request_reset(
             message="If an account exists with this email, you will receive a password reset link."
         )
     
-    # Create reset token
-    reset_token = create_reset_token(user.id, user.email)
-    reset_url = f"https://www.shadowkey.org/reset-password?token={reset_token}"
+    # Create reset token and record its digest so it can be used only once
+    now = datetime.now(timezone.utc)
+    reset_token = create_reset_token(user.id, user.email, now)
     
-    # Try to send email
-    try:
-        email_service = get_email_service()
-        await email_service.send_email(
-            to_email=email,
-            subject="🔐 Reset Your ShadowKey Password",
-            html_content=f"""
-            <div style="font-family: sans-serif; max-width: 600px; margin: 0 auto; background: #0f172a; padding: 40px; border-radius: 16px;">
-                <h1 style="color: #22d3ee;">ShadowKey Password Reset</h1>
-                <p style="color: #e2e8f0;">You requested a password reset for your ShadowKey account.</p>
-                <p style="color: #e2e8f0;">Click the button below to set a new password. This link expires in 1 hour.</p>
-                <div style="text-align: center; margin: 32px 0;">
-                    <a href="{reset_url}" style="background: linear-gradient(to right, #06b6d4, #3b82f6); color: white; padding: 16px 32px; border-radius: 8px; text-decoration: none; font-weight: bold;">Reset Password</a>
-                </div>
-                <p style="color: #94a3b8; font-size: 14px;">If you didn't request this, you can safely ignore this email.</p>
-                <p style="color: #64748b; font-size: 12px; margin-top: 32px;">ShadowKey Security Team</p>
-            </div>
-            """
+    # Drop this user's expired tokens so the table stays bounded
+    db.execute(
+        delete(PasswordResetToken).where(
+            PasswordResetToken.user_id == user.id,
+            PasswordResetToken.expires_at < now
         )
-        logger.info(f"Password reset email sent to {email}")
-    except Exception as e:
-        # If email fails, log the token for debugging (remove in production)
-        logger.error(f"Failed to send reset email: {e}")
-        logger.info(f"Password reset token for {email}: {reset_token}")
+    )
+    db.add(PasswordResetToken(
+        token_hash=PasswordResetToken.hash_token(reset_token),
+        user_id=user.id,
+        created_at=now,
+        expires_at=now + RESET_TOKEN_TTL
+    ))
+    db.commit()
+    
+    reset_url = f"https://www.shadowkey.org/reset-password?token={reset_token}"
+    
+    # Send email in the background
+    background_tasks.add_task(_send_reset_email_bg, email, reset_url, reset_token)
     
     return RequestResetResponse(
         success=True,
@@ -471,6 +605,22 @@ async def reset_password(
             detail="Invalid or expired reset token. Please request a new password reset."
         )
     
+    # Claim the token; a second use (or an unknown token) matches no row
+    claimed = db.execute(
+        update(PasswordResetToken)
+        .where(
+            PasswordResetToken.token_hash == PasswordResetToken.hash_token(payload.token),
+            PasswordResetToken.used == False
+        )
+        .values(used=True)
+        .execution_options(synchronize_session=False)
+    )
+    if claimed.rowcount != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired reset token. Please request a new password reset."
+        )
+    
     # Find user
     user = db.query(User).filter(User.id == token_data.get("sub")).first()
     
@@ -483,6 +633,7 @@ async def reset_password(
     # Set new password
     user.set_password(payload.new_password)
     db.commit()
+    _invalidate_cached_user(user.id)
     
     logger.info(f"Password reset successful for {user.email}")
     
@@ -508,10 +659,8 @@ async def admin_reset_password(
     db: Session = Depends(get_db)
 ):
     """Admin direct password reset - bypasses email verification."""
-    settings = get_settings()
-    
     # Verify admin secret
-    expected_secret = getattr(settings, 'admin_secret', 'SHADOWKEY_ADMIN_2024')
+    expected_secret = getattr(_SETTINGS, 'admin_secret', 'SHADOWKEY_ADMIN_2024')
     if payload.admin_secret != expected_secret:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -531,6 +680,7 @@ async def admin_reset_password(
     # Set new password
     user.set_password(payload.new_password)
     db.commit()
+    _invalidate_cached_user(user.id)
     
     logger.info(f"Admin password reset successful for {user.email}")
     
@@ -552,10 +702,8 @@ async def admin_promote_user(
     db: Session = Depends(get_db)
 ):
     """Admin endpoint to create/promote a superuser."""
-    settings = get_settings()
-    
     # Verify secret
-    expected_secret = getattr(settings, 'admin_secret', 'SHADOWKEY_ADMIN_2024')
+    expected_secret = getattr(_SETTINGS, 'admin_secret', 'SHADOWKEY_ADMIN_2024')
     if payload.admin_secret != expected_secret:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
@@ -586,6 +734,7 @@ async def admin_promote_user(
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    _invalidate_cached_user(user.id)
         
     return {
         "success": True,
@@ -2,16 +2,25 @@
 Contractor Router - Agency Bridge Feature
 Authentication and multi-client management for contractors.
 """
+import asyncio
 import logging
 import secrets
 from datetime import datetime, timezone, timedelta
+from string import Template
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
+from urllib.parse import urlencode
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload, raiseload
+from pydantic import BaseModel, EmailStr, TypeAdapter
 
+from app.config import get_settings
 from app.database import get_db
 from app.models.contractor_account import ContractorAccount, ClientLink
+from app.services import contractor_cache
+from app.services.email_service import get_email_service
+from app.utils.rate_limiter import limiter
 
 logger = logging.getLogger("contractor_vault.contractor")
 
@@ -57,23 +66,81 @@ class ClientLinkResponse(BaseModel):
         from_attributes = True
 
 
+_CLIENT_LINKS_ADAPTER = TypeAdapter(list[ClientLinkResponse])
+
+
 class UpdateProfileRequest(BaseModel):
     """Request to update contractor profile."""
     display_name: Optional[str] = None
 
 
+def _linked_clients(contractor: ContractorAccount) -> list[dict]:
+    """Summarize a contractor's eagerly loaded (active) client links."""
+    return [
+        {
+            "id": link.id,
+            "client_name": link.client_name,
+            "linked_at": link.linked_at.isoformat()
+        }
+        for link in contractor.client_links
+    ]
+
+
+# ===== Email =====
+
+# Delivery attempts for a magic link email, with exponential backoff
+# between them (1s, 2s, ...)
+MAGIC_LINK_SEND_ATTEMPTS = 3
+
+_MAGIC_LINK_EMAIL_TEMPLATE = Template("""
+<div style="font-family: sans-serif; max-width: 600px; margin: 0 auto; background: #0f172a; padding: 40px; border-radius: 16px;">
+    <h1 style="color: #22d3ee;">Sign in to Contractor Vault</h1>
+    <p style="color: #e2e8f0;">Click the button below to sign in. This link expires in 1 hour.</p>
+    <div style="text-align: center; margin: 32px 0;">
+        <a href="$login_url" style="background: linear-gradient(to right, #06b6d4, #3b82f6); color: white; padding: 16px 32px; border-radius: 8px; text-decoration: none; font-weight: bold;">Sign In</a>
+    </div>
+    <p style="color: #94a3b8; font-size: 14px;">If you didn't request this, you can safely ignore this email.</p>
+</div>
+""")
+
+
+async def _send_magic_link_bg(email: str, login_url: str) -> None:
+    """Deliver a magic link email after the response has been sent."""
+    email_service = get_email_service()
+    if not email_service.api_key:
+        logger.warning(f"Email not configured, magic link for {email} not sent")
+        return
+    
+    html_content = _MAGIC_LINK_EMAIL_TEMPLATE.substitute(login_url=login_url)
+    for attempt in range(MAGIC_LINK_SEND_ATTEMPTS):
+        if attempt:
+            await asyncio.sleep(2 ** (attempt - 1))
+        if await email_service.send_email(
+            to_email=email,
+            subject="Your Contractor Vault sign-in link",
+            html_content=html_content
+        ):
+            return
+    
+    logger.error(f"Failed to send magic link to {email} after {MAGIC_LINK_SEND_ATTEMPTS} attempts")
+
+
 # ===== Endpoints =====
 
 @router.post("/auth/request-magic-link")
-async def request_magic_link(
+@limiter.limit("5/minute")
+def request_magic_link(
+    request: Request,
     payload: MagicLinkRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     """
     Request a magic link login email.
     
     Creates contractor account if doesn't exist.
-    Sends email with login link (would integrate with email service).
+    The email is sent in the background, so SMTP latency never delays
+    the response.
     """
     # Find or create contractor account
     contractor = db.query(ContractorAccount).filter(
@@ -91,21 +158,23 @@ async def request_magic_link(
     
     db.commit()
     
-    # In production, would send email here
-    # For demo, return the token directly
+    login_url = "contractor-vault://login?" + urlencode({"email": payload.email, "token": token})
+    background_tasks.add_task(_send_magic_link_bg, payload.email, login_url)
     logger.info(f"Magic link requested for {payload.email}")
     
-    return {
+    response = {
         "success": True,
         "message": "Magic link sent to your email",
-        # In production, remove this - only for testing
-        "demo_token": token,
-        "demo_link": f"contractor-vault://login?email={payload.email}&token={token}"
     }
+    # Only expose the token when debugging; it is a login credential
+    if get_settings().debug:
+        response["demo_token"] = token
+        response["demo_link"] = login_url
+    return response
 
 
 @router.post("/auth/verify", response_model=ContractorProfile)
-async def verify_magic_link(
+def verify_magic_link(
     payload: MagicLinkVerify,
     db: Session = Depends(get_db),
 ):
@@ -114,7 +183,10 @@ async def verify_magic_link(
     
     Returns contractor profile with linked clients.
     """
-    contractor = db.query(ContractorAccount).filter(
+    contractor = db.query(ContractorAccount).options(
+        joinedload(ContractorAccount.client_links.and_(ClientLink.is_active == True)),
+        raiseload("*")
+    ).filter(
         ContractorAccount.email == payload.email,
         ContractorAccount.magic_token == payload.token,
         ContractorAccount.is_active == True
@@ -126,53 +198,60 @@ async def verify_magic_link(
             detail="Invalid or expired magic link"
         )
     
-    # Check expiry
-    if contractor.magic_token_expires < datetime.now(timezone.utc):
+    # Check expiry (handle timezone-naive timestamps)
+    now = datetime.now(timezone.utc)
+    expires = contractor.magic_token_expires
+    if expires is not None and expires.tzinfo is None:
+        expires = expires.replace(tzinfo=timezone.utc)
+    if expires is None or expires < now:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Magic link has expired"
         )
     
+    # Build the response from the links loaded with the contractor
+    profile = ContractorProfile(
+        id=contractor.id,
+        email=contractor.email,
+        display_name=contractor.display_name,
+        is_active=contractor.is_active,
+        created_at=contractor.created_at,
+        last_login=now,
+        linked_clients=_linked_clients(contractor)
+    )
+    
     # Clear token and update last login
     contractor.magic_token = None
     contractor.magic_token_expires = None
-    contractor.last_login = datetime.now(timezone.utc)
+    contractor.last_login = now
     
     db.commit()
-    
-    # Get linked clients
-    links = db.query(ClientLink).filter(
-        ClientLink.contractor_id == contractor.id,
-        ClientLink.is_active == True
-    ).all()
+    contractor_cache.invalidate(payload.email)
     
     logger.info(f"Contractor {payload.email} logged in")
     
-    return ContractorProfile(
-        id=contractor.id,
-        email=contractor.email,
-        display_name=contractor.display_name,
-        is_active=contractor.is_active,
-        created_at=contractor.created_at,
-        last_login=contractor.last_login,
-        linked_clients=[
-            {
-                "id": link.id,
-                "client_name": link.client_name,
-                "linked_at": link.linked_at.isoformat()
-            }
-            for link in links
-        ]
-    )
+    return profile
 
 
 @router.get("/profile/{email}", response_model=ContractorProfile)
-async def get_contractor_profile(
+def get_contractor_profile(
     email: str,
     db: Session = Depends(get_db),
 ):
-    """Get contractor profile and linked clients."""
-    contractor = db.query(ContractorAccount).filter(
+    """
+    Get contractor profile and linked clients.
+    
+    The contractor and its active links come back in one joined query;
+    the serialized response is cached so repeat reads skip the model.
+    """
+    cached = contractor_cache.get(contractor_cache.PROFILE, email)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    contractor = db.query(ContractorAccount).options(
+        joinedload(ContractorAccount.client_links.and_(ClientLink.is_active == True)),
+        raiseload("*")
+    ).filter(
         ContractorAccount.email == email
     ).first()
     
@@ -182,31 +261,23 @@ async def get_contractor_profile(
             detail="Contractor not found"
         )
     
-    links = db.query(ClientLink).filter(
-        ClientLink.contractor_id == contractor.id,
-        ClientLink.is_active == True
-    ).all()
-    
-    return ContractorProfile(
+    profile = ContractorProfile(
         id=contractor.id,
         email=contractor.email,
         display_name=contractor.display_name,
         is_active=contractor.is_active,
         created_at=contractor.created_at,
         last_login=contractor.last_login,
-        linked_clients=[
-            {
-                "id": link.id,
-                "client_name": link.client_name,
-                "linked_at": link.linked_at.isoformat()
-            }
-            for link in links
-        ]
+        linked_clients=_linked_clients(contractor)
     )
+    body = profile.model_dump_json().encode()
+    contractor_cache.put(contractor_cache.PROFILE, email, body)
+    
+    return Response(content=body, media_type="application/json")
 
 
 @router.put("/profile/{email}")
-async def update_contractor_profile(
+def update_contractor_profile(
     email: str,
     payload: UpdateProfileRequest,
     db: Session = Depends(get_db),
@@ -226,32 +297,40 @@ async def update_contractor_profile(
         contractor.display_name = payload.display_name
     
     db.commit()
+    contractor_cache.invalidate(email)
     
     return {"success": True, "message": "Profile updated"}
 
 
 @router.get("/clients/{email}", response_model=list[ClientLinkResponse])
-async def get_linked_clients(
+def get_linked_clients(
     email: str,
     db: Session = Depends(get_db),
 ):
-    """Get all clients linked to a contractor account."""
-    contractor = db.query(ContractorAccount).filter(
+    """Get all clients linked to a contractor account (cached like the profile)."""
+    cached = contractor_cache.get(contractor_cache.CLIENTS, email)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    contractor = db.query(ContractorAccount).options(
+        joinedload(ContractorAccount.client_links),
+        raiseload("*")
+    ).filter(
         ContractorAccount.email == email
     ).first()
     
     if not contractor:
         return []
     
-    links = db.query(ClientLink).filter(
-        ClientLink.contractor_id == contractor.id
-    ).all()
+    links = [ClientLinkResponse.model_validate(link) for link in contractor.client_links]
+    body = _CLIENT_LINKS_ADAPTER.dump_json(links)
+    contractor_cache.put(contractor_cache.CLIENTS, email, body)
     
-    return links
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/link")
-async def link_client(
+def link_client(
     contractor_email: str,
     client_name: str,
     invited_by: Optional[str] = None,
@@ -273,16 +352,19 @@ async def link_client(
         db.add(contractor)
         db.flush()
     
-    # Check if already linked
-    existing = db.query(ClientLink).filter(
+    # Check if already linked (only the columns the decision needs)
+    existing = db.query(ClientLink.id, ClientLink.is_active).filter(
         ClientLink.contractor_id == contractor.id,
         ClientLink.client_name == client_name
     ).first()
     
     if existing:
         if not existing.is_active:
-            existing.is_active = True
+            db.query(ClientLink).filter(ClientLink.id == existing.id).update(
+                {ClientLink.is_active: True}, synchronize_session=False
+            )
             db.commit()
+            contractor_cache.invalidate(contractor_email)
             return {"success": True, "message": "Client link reactivated", "link_id": existing.id}
         return {"success": True, "message": "Already linked", "link_id": existing.id}
     
@@ -293,28 +375,53 @@ async def link_client(
         invited_by=invited_by,
     )
     db.add(link)
-    db.commit()
+    db.flush()
+    link_id = link.id
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent request created the same link first
+        db.rollback()
+        link_id = db.query(ClientLink.id).join(ContractorAccount).filter(
+            ContractorAccount.email == contractor_email,
+            ClientLink.client_name == client_name
+        ).scalar()
+        return {"success": True, "message": "Already linked", "link_id": link_id}
+    contractor_cache.invalidate(contractor_email)
     
     logger.info(f"Linked {contractor_email} to client {client_name}")
     
-    return {"success": True, "message": "Client linked", "link_id": link.id}
+    return {"success": True, "message": "Client linked", "link_id": link_id}
 
 
 @router.delete("/unlink/{link_id}")
-async def unlink_client(
+def unlink_client(
     link_id: str,
     db: Session = Depends(get_db),
 ):
     """Unlink a contractor from a client."""
-    link = db.query(ClientLink).filter(ClientLink.id == link_id).first()
+    # The owning contractor's email comes back with the update, so only
+    # their cached snapshots are dropped
+    unlinked = db.execute(
+        update(ClientLink)
+        .where(ClientLink.id == link_id)
+        .values(is_active=False)
+        .returning(
+            ClientLink.contractor_id,
+            select(ContractorAccount.email)
+            .where(ContractorAccount.id == ClientLink.contractor_id)
+            .scalar_subquery()
+            .label("contractor_email"),
+        )
+    ).first()
     
-    if not link:
+    if not unlinked:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Link not found"
         )
     
-    link.is_active = False
     db.commit()
+    contractor_cache.invalidate(unlinked.contractor_email)
     
     return {"success": True, "message": "Client unlinked"}
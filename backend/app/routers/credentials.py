@@ -4,11 +4,12 @@ CRUD operations for stored credentials
 """
 import logging
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, Request, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session, raiseload
 
 from app.database import get_db
-from app.models import Credential, AuditAction
+from app.models import Credential, SessionToken, AuditAction
 from app.schemas.credential import (
     CredentialCreate,
     CredentialUpdate,
@@ -16,7 +17,7 @@ from app.schemas.credential import (
     CredentialListResponse,
 )
 from app.services.encryption import get_encryption_service, EncryptionService
-from app.services.audit_service import AuditService
+from app.services.audit_service import write_audit_log
 from app.middleware.audit_middleware import get_audit_context
 
 logger = logging.getLogger(__name__)
@@ -24,29 +25,24 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/credentials", tags=["Credentials"])
 
 
-def get_audit_service(db: Session = Depends(get_db)) -> AuditService:
-    """Dependency for audit service."""
-    return AuditService(db)
-
-
 @router.post(
     "/",
     response_model=CredentialResponse,
     status_code=status.HTTP_201_CREATED,
     summary="Create a new credential"
 )
-async def create_credential(
+def create_credential(
     request: Request,
     payload: CredentialCreate,
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     encryption_service: Annotated[EncryptionService, Depends(get_encryption_service)],
-    audit_service: Annotated[AuditService, Depends(get_audit_service)],
 ):
     """
     Create a new stored credential.
     
-    - Encrypts the password using Fernet
-    - Logs CREDENTIAL_CREATED to audit trail
+    - Encrypts the password using AES-GCM
+    - Logs CREDENTIAL_CREATED to audit trail (after the response)
     """
     # Encrypt the password
     encrypted_password = encryption_service.encrypt(payload.password)
@@ -63,11 +59,11 @@ async def create_credential(
     
     db.add(credential)
     db.commit()
-    db.refresh(credential)
     
     # Log creation
     audit_context = get_audit_context(request)
-    audit_service.log(
+    background_tasks.add_task(
+        write_audit_log,
         actor=payload.created_by,
         action=AuditAction.CREDENTIAL_CREATED,
         target_resource=credential.target_url,
@@ -89,7 +85,7 @@ async def create_credential(
     response_model=CredentialListResponse,
     summary="List all credentials"
 )
-async def list_credentials(
+def list_credentials(
     db: Annotated[Session, Depends(get_db)],
     skip: int = 0,
     limit: int = 100,
@@ -101,16 +97,25 @@ async def list_credentials(
     - Returns paginated list
     - Passwords are never included in response
     """
-    query = db.query(Credential)
+    # The window count carries the filtered total on every row, so the
+    # page and the total come back in one query
+    stmt = select(Credential, func.count().over().label("total")).options(raiseload("*"))
     
     if active_only:
-        query = query.filter(Credential.is_active == True)
+        stmt = stmt.where(Credential.is_active == True)
+    
+    rows = db.execute(stmt.offset(skip).limit(limit)).all()
     
-    total = query.count()
-    credentials = query.offset(skip).limit(limit).all()
+    if rows:
+        total = rows[0].total
+    elif skip:
+        # Paged past the end; the total still has to be counted
+        total = db.scalar(stmt.with_only_columns(func.count(Credential.id)))
+    else:
+        total = 0
     
     return CredentialListResponse(
-        credentials=credentials,
+        credentials=[row.Credential for row in rows],
         total=total
     )
 
@@ -120,7 +125,7 @@ async def list_credentials(
     response_model=CredentialResponse,
     summary="Get a specific credential"
 )
-async def get_credential(
+def get_credential(
     credential_id: str,
     db: Annotated[Session, Depends(get_db)],
 ):
@@ -143,25 +148,38 @@ async def get_credential(
     response_model=CredentialResponse,
     summary="Update a credential"
 )
-async def update_credential(
+def update_credential(
     request: Request,
     credential_id: str,
     payload: CredentialUpdate,
     admin_email: str,  # Would normally come from auth
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
     encryption_service: Annotated[EncryptionService, Depends(get_encryption_service)],
-    audit_service: Annotated[AuditService, Depends(get_audit_service)],
 ):
     """
     Update an existing credential.
     
     - Only provided fields are updated
     - If password is provided, it's re-encrypted
-    - Logs CREDENTIAL_UPDATED to audit trail
+    - Logs CREDENTIAL_UPDATED to audit trail (after the response)
     """
-    credential = db.query(Credential).filter(
-        Credential.id == credential_id
-    ).first()
+    update_data = payload.model_dump(exclude_unset=True)
+    
+    # Handle password encryption if provided
+    if "password" in update_data:
+        update_data["encrypted_password"] = encryption_service.encrypt(update_data.pop("password"))
+    
+    # Apply updates and read back the row in one statement
+    if update_data:
+        credential = db.execute(
+            update(Credential)
+            .where(Credential.id == credential_id)
+            .values(**update_data)
+            .returning(Credential)
+        ).scalar_one_or_none()
+    else:
+        credential = db.get(Credential, credential_id)
     
     if not credential:
         raise HTTPException(
@@ -169,22 +187,18 @@ async def update_credential(
             detail="Credential not found"
         )
     
-    update_data = payload.model_dump(exclude_unset=True)
-    
-    # Handle password encryption if provided
-    if "password" in update_data:
-        update_data["encrypted_password"] = encryption_service.encrypt(update_data.pop("password"))
-    
-    # Apply updates
-    for field, value in update_data.items():
-        setattr(credential, field, value)
+    # Keep the URL denormalized onto access tokens in sync
+    if "target_url" in update_data:
+        db.query(SessionToken).filter(
+            SessionToken.credential_id == credential.id
+        ).update({SessionToken.target_url: credential.target_url}, synchronize_session=False)
     
     db.commit()
-    db.refresh(credential)
     
     # Log update
     audit_context = get_audit_context(request)
-    audit_service.log(
+    background_tasks.add_task(
+        write_audit_log,
         actor=admin_email,
         action=AuditAction.CREDENTIAL_UPDATED,
         target_resource=credential.target_url,
@@ -206,21 +220,24 @@ async def update_credential(
     status_code=status.HTTP_204_NO_CONTENT,
     summary="Delete a credential (soft delete)"
 )
-async def delete_credential(
+def delete_credential(
     request: Request,
     credential_id: str,
     admin_email: str,  # Would normally come from auth
+    background_tasks: BackgroundTasks,
     db: Annotated[Session, Depends(get_db)],
-    audit_service: Annotated[AuditService, Depends(get_audit_service)],
 ):
     """
     Soft delete a credential.
     
     - Marks as inactive rather than deleting
-    - Logs CREDENTIAL_DELETED to audit trail
+    - Logs CREDENTIAL_DELETED to audit trail (after the response)
     """
-    credential = db.query(Credential).filter(
-        Credential.id == credential_id
+    credential = db.execute(
+        update(Credential)
+        .where(Credential.id == credential_id)
+        .values(is_active=False)
+        .returning(Credential.id, Credential.name, Credential.target_url)
     ).first()
     
     if not credential:
@@ -229,12 +246,12 @@ async def delete_credential(
             detail="Credential not found"
         )
     
-    credential.is_active = False
     db.commit()
     
     # Log deletion
     audit_context = get_audit_context(request)
-    audit_service.log(
+    background_tasks.add_task(
+        write_audit_log,
         actor=admin_email,
         action=AuditAction.CREDENTIAL_DELETED,
         target_resource=credential.target_url,
@@ -8,7 +8,9 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.database import get_db
+from app.models.device import DeviceInfo
 from app.services.device_service import get_device_service, DeviceService
+from app.utils.responses import ORJSONResponse
 from app.schemas.device import (
     DeviceContext,
     DeviceInfoResponse,
@@ -21,7 +23,10 @@ from app.schemas.device import (
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/devices", tags=["Device Trust"])
+router = APIRouter(
+    prefix="/api/devices",
+    tags=["Device Trust"],
+)
 
 
 def get_client_ip(request: Request) -> str:
@@ -32,8 +37,20 @@ def get_client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
+_DEVICE_INFO_FIELDS = tuple(DeviceInfoResponse.model_fields)
+# List endpoints select just the response's columns, skipping ORM objects
+_DEVICE_INFO_COLUMNS = tuple(getattr(DeviceInfo, field) for field in _DEVICE_INFO_FIELDS)
+
+
+def _device_info(device) -> DeviceInfoResponse:
+    """Build a response from an ORM object or column row without re-validating."""
+    return DeviceInfoResponse.model_construct(
+        **{field: getattr(device, field) for field in _DEVICE_INFO_FIELDS}
+    )
+
+
 @router.get("", response_model=DeviceListResponse)
-async def list_all_devices(
+def list_all_devices(
     skip: int = 0,
     limit: int = 100,
     blocked_only: bool = False,
@@ -41,15 +58,17 @@ async def list_all_devices(
     device_service: DeviceService = Depends(get_device_service)
 ):
     """List all devices."""
-    devices = device_service.get_all_devices(db, skip, limit, blocked_only)
+    devices = device_service.get_all_devices(
+        db, skip, limit, blocked_only, columns=_DEVICE_INFO_COLUMNS
+    )
     return DeviceListResponse(
-        devices=[DeviceInfoResponse.model_validate(d) for d in devices],
+        devices=[_device_info(d) for d in devices],
         total=len(devices)
     )
 
 
 @router.get("/contractor/{contractor_email}", response_model=DeviceListResponse)
-async def list_contractor_devices(
+def list_contractor_devices(
     contractor_email: str,
     db: Session = Depends(get_db),
     device_service: DeviceService = Depends(get_device_service)
@@ -57,13 +76,13 @@ async def list_contractor_devices(
     """List all devices for a specific contractor."""
     devices = device_service.get_devices_for_contractor(db, contractor_email)
     return DeviceListResponse(
-        devices=[DeviceInfoResponse.model_validate(d) for d in devices],
+        devices=[_device_info(d) for d in devices],
         total=len(devices)
     )
 
 
 @router.post("/validate", response_model=DeviceValidationResult)
-async def validate_device(
+def validate_device(
     contractor_email: str,
     context: DeviceContext,
     request: Request,
@@ -87,8 +106,8 @@ async def validate_device(
     return result
 
 
-@router.post("/{device_id}/trust")
-async def trust_device(
+@router.post("/{device_id}/trust", response_class=ORJSONResponse)
+def trust_device(
     device_id: str,
     request: DeviceTrustRequest,
     db: Session = Depends(get_db),
@@ -99,7 +118,6 @@ async def trust_device(
         success = device_service.trust_device(db, device_id, request.admin_email)
     else:
         # Untrust = reset to default state
-        from app.models.device import DeviceInfo
         device = db.query(DeviceInfo).filter(DeviceInfo.id == device_id).first()
         if device:
             device.is_trusted = False
@@ -115,8 +133,8 @@ async def trust_device(
     return {"success": True, "message": "Device trust updated"}
 
 
-@router.post("/{device_id}/block")
-async def block_device(
+@router.post("/{device_id}/block", response_class=ORJSONResponse)
+def block_device(
     device_id: str,
     request: DeviceBlockRequest,
     db: Session = Depends(get_db),
@@ -136,8 +154,8 @@ async def block_device(
     return {"success": True, "message": "Device blocked"}
 
 
-@router.post("/{device_id}/unblock")
-async def unblock_device(
+@router.post("/{device_id}/unblock", response_class=ORJSONResponse)
+def unblock_device(
     device_id: str,
     request: DeviceUnblockRequest,
     db: Session = Depends(get_db),
@@ -157,12 +175,11 @@ async def unblock_device(
 
 
 @router.get("/{device_id}", response_model=DeviceInfoResponse)
-async def get_device(
+def get_device(
     device_id: str,
     db: Session = Depends(get_db)
 ):
     """Get device details."""
-    from app.models.device import DeviceInfo
     device = db.query(DeviceInfo).filter(DeviceInfo.id == device_id).first()
     
     if not device:
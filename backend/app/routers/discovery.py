@@ -3,14 +3,18 @@ Contractor Vault - Discovery Router
 SaaS app discovery and shadow IT detection endpoints
 """
 import logging
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
+from sqlalchemy import exists, tuple_, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.database import get_db
-from app.services.discovery_service import get_discovery_service, DiscoveryService
+from app.services.discovery_service import get_discovery_service, seed_known_apps_background, DiscoveryService
 from app.models.saas_app import SaaSApp
-from app.models.detected_signup import DetectedSignup
+from app.models.detected_signup import DetectedSignup, SignupStatus
+from app.utils.responses import ORJSONResponse
 from app.schemas.discovery import (
     SaaSAppInfo,
     SaaSAppCreate,
@@ -23,11 +27,26 @@ from app.schemas.discovery import (
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter(prefix="/api/discovery", tags=["SaaS Discovery"])
+router = APIRouter(
+    prefix="/api/discovery",
+    tags=["SaaS Discovery"],
+)
+
+# List endpoints select just the columns their responses expose
+_SAAS_APP_INFO_COLUMNS = tuple(getattr(SaaSApp, field) for field in SaaSAppInfo.model_fields)
+_DETECTED_APP_COLUMNS = (
+    DetectedSignup.id,
+    DetectedSignup.contractor_email,
+    DetectedSignup.service_name,
+    DetectedSignup.service_domain,
+    DetectedSignup.email_subject,
+    DetectedSignup.detected_at,
+    DetectedSignup.status,
+)
 
 
 @router.get("/apps", response_model=list[SaaSAppInfo])
-async def list_apps(
+def list_apps(
     skip: int = 0,
     limit: int = 100,
     risk_level: Optional[str] = None,
@@ -35,19 +54,20 @@ async def list_apps(
     discovery_service: DiscoveryService = Depends(get_discovery_service)
 ):
     """List all known SaaS apps."""
-    apps = discovery_service.get_all_apps(db, skip, limit, risk_level)
-    return [SaaSAppInfo.model_validate(app) for app in apps]
+    apps = discovery_service.get_all_apps(
+        db, skip, limit, risk_level, columns=_SAAS_APP_INFO_COLUMNS
+    )
+    return [SaaSAppInfo.model_construct(**app._mapping) for app in apps]
 
 
 @router.post("/apps", response_model=SaaSAppInfo)
-async def add_app(
+def add_app(
     payload: SaaSAppCreate,
     db: Session = Depends(get_db)
 ):
     """Add a new SaaS app to the catalog."""
     # Check for duplicate
-    existing = db.query(SaaSApp).filter(SaaSApp.domain == payload.domain).first()
-    if existing:
+    if db.query(exists().where(SaaSApp.domain == payload.domain)).scalar():
         raise HTTPException(status_code=409, detail="App with this domain already exists")
     
     app = SaaSApp(
@@ -61,15 +81,21 @@ async def add_app(
     )
     
     db.add(app)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Lost a race on the unique domain, or the name is taken
+        db.rollback()
+        raise HTTPException(status_code=409, detail="App with this name or domain already exists")
     db.refresh(app)
+    get_discovery_service().invalidate_report()
     
     logger.info(f"Added SaaS app: {payload.name}")
     return SaaSAppInfo.model_validate(app)
 
 
 @router.get("/apps/{app_id}", response_model=SaaSAppInfo)
-async def get_app(
+def get_app(
     app_id: str,
     db: Session = Depends(get_db)
 ):
@@ -81,7 +107,7 @@ async def get_app(
 
 
 @router.patch("/apps/{app_id}", response_model=SaaSAppInfo)
-async def update_app(
+def update_app(
     app_id: str,
     payload: SaaSAppUpdate,
     db: Session = Depends(get_db)
@@ -104,12 +130,13 @@ async def update_app(
     
     db.commit()
     db.refresh(app)
+    get_discovery_service().invalidate_report()
     
     return SaaSAppInfo.model_validate(app)
 
 
-@router.post("/apps/{app_id}/authorize")
-async def authorize_app(
+@router.post("/apps/{app_id}/authorize", response_class=ORJSONResponse)
+def authorize_app(
     app_id: str,
     payload: AppAuthorizationRequest,
     db: Session = Depends(get_db),
@@ -130,15 +157,36 @@ async def authorize_app(
     return {"success": True, "message": f"App {payload.action}d successfully"}
 
 
+def _detected_app_info(detection) -> DetectedAppInfo:
+    """Build a response from an ORM object or column row without re-validating."""
+    return DetectedAppInfo.model_construct(
+        id=detection.id,
+        contractor_email=detection.contractor_email,
+        service_name=detection.service_name,
+        service_domain=detection.service_domain,
+        email_subject=detection.email_subject,
+        detected_at=detection.detected_at,
+        status=detection.status
+    )
+
+
 @router.get("/report", response_model=DiscoveryReport)
-async def get_discovery_report(
+def get_discovery_report(
     db: Session = Depends(get_db),
     discovery_service: DiscoveryService = Depends(get_discovery_service)
 ):
-    """Get a summary report of discovered SaaS usage."""
+    """
+    Get a summary report of discovered SaaS usage.
+    
+    The serialized report is cached briefly and dropped on writes.
+    """
+    cached = discovery_service.get_cached_report()
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
     report_data = discovery_service.get_discovery_report(db)
     
-    return DiscoveryReport(
+    report = DiscoveryReport(
         total_apps_detected=report_data["total_apps_detected"],
         unique_apps=report_data["unique_apps"],
         high_risk_apps=report_data["high_risk_apps"],
@@ -147,54 +195,62 @@ async def get_discovery_report(
         apps_by_category=report_data["apps_by_category"],
         apps_by_risk=report_data["apps_by_risk"],
         recent_detections=[
-            DetectedAppInfo(
-                id=d.id,
-                contractor_email=d.contractor_email,
-                service_name=d.service_name,
-                service_domain=d.service_domain,
-                email_subject=d.email_subject,
-                detected_at=d.detected_at,
-                status=d.status
-            )
-            for d in report_data["recent_detections"]
+            _detected_app_info(d) for d in report_data["recent_detections"]
         ]
     )
+    body = report.model_dump_json().encode()
+    discovery_service.cache_report(body)
+    
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/detections", response_model=list[DetectedAppInfo])
-async def list_detections(
-    skip: int = 0,
+def list_detections(
     limit: int = 100,
     contractor_email: Optional[str] = None,
     status: Optional[str] = None,
+    after_detected_at: Optional[datetime] = None,
+    after_id: Optional[str] = None,
+    skip: int = 0,
     db: Session = Depends(get_db)
 ):
-    """List all detected signups."""
-    query = db.query(DetectedSignup)
+    """
+    List detected signups, newest first.
+    
+    Paginate by passing the detected_at and id of the last item of the
+    previous page as after_detected_at/after_id; each page is then an
+    index range scan regardless of depth. skip is still honoured when no
+    cursor is given, for older clients.
+    """
+    if (after_detected_at is None) != (after_id is None):
+        raise HTTPException(
+            status_code=400,
+            detail="after_detected_at and after_id must be given together"
+        )
+    
+    query = db.query(*_DETECTED_APP_COLUMNS)
     
     if contractor_email:
         query = query.filter(DetectedSignup.contractor_email == contractor_email)
     if status:
         query = query.filter(DetectedSignup.status == status)
     
-    detections = query.order_by(DetectedSignup.detected_at.desc()).offset(skip).limit(limit).all()
-    
-    return [
-        DetectedAppInfo(
-            id=d.id,
-            contractor_email=d.contractor_email,
-            service_name=d.service_name,
-            service_domain=d.service_domain,
-            email_subject=d.email_subject,
-            detected_at=d.detected_at,
-            status=d.status
+    if after_id is not None:
+        query = query.filter(
+            tuple_(DetectedSignup.detected_at, DetectedSignup.id) < (after_detected_at, after_id)
         )
-        for d in detections
-    ]
+    
+    query = query.order_by(DetectedSignup.detected_at.desc(), DetectedSignup.id.desc())
+    if after_id is None and skip:
+        query = query.offset(skip)
+    
+    detections = query.limit(limit).all()
+    
+    return [_detected_app_info(d) for d in detections]
 
 
 @router.get("/contractor/{contractor_email}", response_model=ContractorAppUsage)
-async def get_contractor_usage(
+def get_contractor_usage(
     contractor_email: str,
     db: Session = Depends(get_db),
     discovery_service: DiscoveryService = Depends(get_discovery_service)
@@ -205,16 +261,7 @@ async def get_contractor_usage(
     return ContractorAppUsage(
         contractor_email=contractor_email,
         apps_used=[
-            DetectedAppInfo(
-                id=d.id,
-                contractor_email=d.contractor_email,
-                service_name=d.service_name,
-                service_domain=d.service_domain,
-                email_subject=d.email_subject,
-                detected_at=d.detected_at,
-                status=d.status
-            )
-            for d in usage_data["apps_used"]
+            _detected_app_info(d) for d in usage_data["apps_used"]
         ],
         total_apps=usage_data["total_apps"],
         high_risk_count=usage_data["high_risk_count"],
@@ -222,37 +269,39 @@ async def get_contractor_usage(
     )
 
 
-@router.post("/seed")
-async def seed_known_apps(
-    db: Session = Depends(get_db),
-    discovery_service: DiscoveryService = Depends(get_discovery_service)
-):
-    """Seed the database with known SaaS apps."""
-    discovery_service.seed_known_apps(db)
-    return {"success": True, "message": "Known apps seeded"}
+@router.post("/seed", response_class=ORJSONResponse)
+def seed_known_apps(background_tasks: BackgroundTasks):
+    """Queue seeding of the known SaaS apps catalog."""
+    background_tasks.add_task(seed_known_apps_background)
+    return {"success": True, "queued": True, "message": "Seeding known apps"}
 
 
-@router.post("/detections/{detection_id}/dismiss")
-async def dismiss_detection(
+@router.post("/detections/{detection_id}/dismiss", response_class=ORJSONResponse)
+def dismiss_detection(
     detection_id: str,
     admin_email: str,
     notes: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
     """Dismiss a detected signup."""
-    from datetime import datetime, timezone
-    from app.models.detected_signup import SignupStatus
+    values = {
+        "status": SignupStatus.DISMISSED.value,
+        "dismissed_at": datetime.now(timezone.utc),
+        "dismissed_by": admin_email,
+    }
+    if notes:
+        values["notes"] = notes
     
-    detection = db.query(DetectedSignup).filter(DetectedSignup.id == detection_id).first()
-    if not detection:
+    dismissed = db.execute(
+        update(DetectedSignup)
+        .where(DetectedSignup.id == detection_id)
+        .values(**values)
+        .returning(DetectedSignup.id)
+    ).first()
+    if not dismissed:
         raise HTTPException(status_code=404, detail="Detection not found")
     
-    detection.status = SignupStatus.DISMISSED.value
-    detection.dismissed_at = datetime.now(timezone.utc)
-    detection.dismissed_by = admin_email
-    if notes:
-        detection.notes = notes
-    
     db.commit()
+    get_discovery_service().invalidate_report()
     
     return {"success": True, "message": "Detection dismissed"}
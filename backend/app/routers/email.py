@@ -3,27 +3,39 @@ Email Router - Shadow IT Detection API
 Endpoints for email OAuth and signup detection.
 """
 import logging
+import orjson
 from datetime import datetime, timezone
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, insert, literal, null, select, union_all, update
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, Field, TypeAdapter
 
-from app.database import get_db
+from app.database import get_db, SessionLocal
 from app.models.detected_signup import DetectedSignup, SignupStatus
 from app.services.email_scanner import get_email_scanner, EmailScannerService
 from app.services.discord_webhook import get_discord_service
+from app.services.discovery_service import DASHBOARD_SUMMARY, get_discovery_service
+from app.utils.emails import Email
+from app.utils.responses import ORJSONResponse
 
 logger = logging.getLogger("contractor_vault.email")
 
 router = APIRouter(prefix="/api/email", tags=["Email Monitoring"])
 
+# Rows fetched per round trip when streaming detection lists
+DETECTION_STREAM_BATCH = 100
+
+# Most detections a single batch dismiss or import may touch
+MAX_DETECTION_BATCH = 500
+
 
 # ===== Schemas =====
 
 class MonitoredEmailCreate(BaseModel):
     """Request to add an email for monitoring."""
-    email: EmailStr
+    email: Email
     contractor_name: Optional[str] = None
 
 
@@ -43,24 +55,49 @@ class DetectionResponse(BaseModel):
         from_attributes = True
 
 
+# Detection lists select just these columns and skip ORM objects
+_DETECTION_COLUMNS = tuple(getattr(DetectedSignup, field) for field in DetectionResponse.model_fields)
+
+
+def _detection_response(row) -> DetectionResponse:
+    """Build a response from a column row without re-validating trusted fields."""
+    return DetectionResponse.model_construct(**row._mapping)
+
+
+# Serializes a whole detection list in one call
+_DETECTION_LIST_ADAPTER = TypeAdapter(list[DetectionResponse])
+
+
 class DismissRequest(BaseModel):
     """Request to dismiss a detection."""
     admin_email: str
     notes: Optional[str] = None
 
 
+class BatchDismissRequest(BaseModel):
+    """Request to dismiss several detections at once."""
+    ids: list[str] = Field(min_length=1, max_length=MAX_DETECTION_BATCH)
+    admin_email: str
+    notes: Optional[str] = None
+
+
 class ManualDetectionRequest(BaseModel):
     """Request to manually add a detection."""
-    contractor_email: EmailStr
+    contractor_email: Email
     service_name: str
     service_domain: Optional[str] = None
     notes: Optional[str] = None
 
 
+class ManualDetectionBatchRequest(BaseModel):
+    """Request to manually add several detections at once."""
+    detections: list[ManualDetectionRequest] = Field(min_length=1, max_length=MAX_DETECTION_BATCH)
+
+
 # ===== Endpoints =====
 
 @router.get("/detections/{contractor_email}", response_model=list[DetectionResponse])
-async def get_detections(
+def get_detections(
     contractor_email: str,
     status_filter: Optional[str] = Query(None, description="Filter by status"),
     db: Session = Depends(get_db),
@@ -70,7 +107,7 @@ async def get_detections(
     
     Shows services they've signed up for using company email.
     """
-    query = db.query(DetectedSignup).filter(
+    query = db.query(*_DETECTION_COLUMNS).filter(
         DetectedSignup.contractor_email == contractor_email
     )
     
@@ -78,31 +115,47 @@ async def get_detections(
         query = query.filter(DetectedSignup.status == status_filter)
     
     detections = query.order_by(DetectedSignup.detected_at.desc()).all()
-    return detections
+    body = _DETECTION_LIST_ADAPTER.dump_json([_detection_response(d) for d in detections])
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/detections", response_model=list[DetectionResponse])
-async def get_all_detections(
+def get_all_detections(
     status_filter: Optional[str] = Query(None, description="Filter by status"),
     limit: int = Query(100, le=500),
-    db: Session = Depends(get_db),
 ):
     """
     Get all detected signups across all contractors.
     
-    Used by the dashboard to show Shadow IT overview.
+    Used by the dashboard to show Shadow IT overview. Rows are streamed
+    out as a JSON array as they are fetched instead of being built into
+    a list first.
     """
-    query = db.query(DetectedSignup)
+    def detection_iter():
+        # The stream outlives the request handler, so it owns its session
+        db = SessionLocal()
+        try:
+            query = db.query(*_DETECTION_COLUMNS)
+            
+            if status_filter:
+                query = query.filter(DetectedSignup.status == status_filter)
+            
+            query = query.order_by(DetectedSignup.detected_at.desc()).limit(limit)
+            
+            separator = b"["
+            for row in query.yield_per(DETECTION_STREAM_BATCH):
+                # Serialized like DetectionResponse so datetimes match the other endpoints
+                yield separator + _detection_response(row).model_dump_json().encode()
+                separator = b","
+            yield b"]" if separator == b"," else b"[]"
+        finally:
+            db.close()
     
-    if status_filter:
-        query = query.filter(DetectedSignup.status == status_filter)
-    
-    detections = query.order_by(DetectedSignup.detected_at.desc()).limit(limit).all()
-    return detections
+    return StreamingResponse(detection_iter(), media_type="application/json")
 
 
-@router.post("/detections/dismiss/{detection_id}")
-async def dismiss_detection(
+@router.post("/detections/dismiss/{detection_id}", response_class=ORJSONResponse)
+def dismiss_detection(
     detection_id: str,
     payload: DismissRequest,
     db: Session = Depends(get_db),
@@ -110,32 +163,72 @@ async def dismiss_detection(
     """
     Dismiss a detection (admin reviewed and approved).
     """
-    detection = db.query(DetectedSignup).filter(
-        DetectedSignup.id == detection_id
+    values = {
+        "status": SignupStatus.DISMISSED.value,
+        "dismissed_at": datetime.now(timezone.utc),
+        "dismissed_by": payload.admin_email,
+    }
+    if payload.notes:
+        values["notes"] = payload.notes
+    
+    dismissed = db.execute(
+        update(DetectedSignup)
+        .where(DetectedSignup.id == detection_id)
+        .values(**values)
+        .returning(DetectedSignup.id)
     ).first()
     
-    if not detection:
+    if not dismissed:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Detection not found"
         )
     
-    detection.status = SignupStatus.DISMISSED.value
-    detection.dismissed_at = datetime.now(timezone.utc)
-    detection.dismissed_by = payload.admin_email
-    if payload.notes:
-        detection.notes = payload.notes
-    
     db.commit()
+    get_discovery_service().invalidate_report()
     
     logger.info(f"Detection {detection_id} dismissed by {payload.admin_email}")
     
     return {"success": True, "message": "Detection dismissed"}
 
 
+@router.post("/detections/dismiss-batch", response_class=ORJSONResponse)
+def dismiss_detections_batch(
+    payload: BatchDismissRequest,
+    db: Session = Depends(get_db),
+):
+    """
+    Dismiss several detections in one UPDATE.
+    
+    Unknown ids are skipped; `updated` is the number actually dismissed.
+    """
+    values = {
+        "status": SignupStatus.DISMISSED.value,
+        "dismissed_at": datetime.now(timezone.utc),
+        "dismissed_by": payload.admin_email,
+    }
+    if payload.notes:
+        values["notes"] = payload.notes
+    
+    result = db.execute(
+        update(DetectedSignup)
+        .where(DetectedSignup.id.in_(set(payload.ids)))
+        .values(**values)
+    )
+    db.commit()
+    
+    if result.rowcount:
+        get_discovery_service().invalidate_report()
+    
+    logger.info(f"{result.rowcount} detections dismissed by {payload.admin_email}")
+    
+    return {"success": True, "updated": result.rowcount}
+
+
 @router.post("/detections/manual", response_model=DetectionResponse)
-async def add_manual_detection(
+def add_manual_detection(
     payload: ManualDetectionRequest,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
 ):
     """
@@ -156,14 +249,15 @@ async def add_manual_detection(
     
     db.add(detection)
     db.commit()
-    db.refresh(detection)
+    get_discovery_service().invalidate_report()
     
     logger.info(f"Manual detection added: {payload.contractor_email} - {payload.service_name}")
     
-    # Send Discord notification
+    # Send Discord notification (after the response)
     discord = get_discord_service()
     if discord.enabled:
-        await discord.notify_shadow_it_detection(
+        background_tasks.add_task(
+            discord.notify_shadow_it_detection,
             contractor_email=payload.contractor_email,
             service_name=payload.service_name,
             detection_type="Manual Entry",
@@ -173,8 +267,52 @@ async def add_manual_detection(
     return detection
 
 
-@router.get("/summary/{contractor_email}")
-async def get_contractor_summary(
+@router.post("/detections/manual-batch", response_class=ORJSONResponse)
+def add_manual_detections_batch(
+    payload: ManualDetectionBatchRequest,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+):
+    """
+    Manually add several detected signups with one multi-row INSERT.
+    """
+    now = datetime.now(timezone.utc)
+    rows = [
+        {
+            "contractor_email": item.contractor_email,
+            "service_name": item.service_name,
+            "service_domain": item.service_domain,
+            "email_subject": "[Manual Entry]",
+            "email_date": now,
+            "detection_type": "manual",
+            "notes": item.notes,
+        }
+        for item in payload.detections
+    ]
+    
+    db.execute(insert(DetectedSignup), rows)
+    db.commit()
+    get_discovery_service().invalidate_report()
+    
+    logger.info(f"Manual detections added: {len(rows)}")
+    
+    # Send Discord notifications (after the response)
+    discord = get_discord_service()
+    if discord.enabled:
+        for item in payload.detections:
+            background_tasks.add_task(
+                discord.notify_shadow_it_detection,
+                contractor_email=item.contractor_email,
+                service_name=item.service_name,
+                detection_type="Manual Entry",
+                subject=item.notes or "Manually added by admin",
+            )
+    
+    return {"success": True, "created": len(rows)}
+
+
+@router.get("/summary/{contractor_email}", response_class=ORJSONResponse)
+def get_contractor_summary(
     contractor_email: str,
     db: Session = Depends(get_db),
 ):
@@ -183,82 +321,113 @@ async def get_contractor_summary(
     
     Returns count of detected services by status.
     """
-    active_count = db.query(DetectedSignup).filter(
-        DetectedSignup.contractor_email == contractor_email,
-        DetectedSignup.status == SignupStatus.ACTIVE.value
-    ).count()
-    
-    dismissed_count = db.query(DetectedSignup).filter(
-        DetectedSignup.contractor_email == contractor_email,
-        DetectedSignup.status == SignupStatus.DISMISSED.value
-    ).count()
+    # One grouped query; counts and the active service list are
+    # accumulated from its rows
+    rows = db.query(
+        DetectedSignup.status,
+        DetectedSignup.service_name,
+        func.count()
+    ).filter(
+        DetectedSignup.contractor_email == contractor_email
+    ).group_by(
+        DetectedSignup.status,
+        DetectedSignup.service_name
+    ).all()
     
-    # Get list of active services
-    active_services = db.query(DetectedSignup.service_name).filter(
-        DetectedSignup.contractor_email == contractor_email,
-        DetectedSignup.status == SignupStatus.ACTIVE.value
-    ).distinct().all()
+    active_count = 0
+    dismissed_count = 0
+    active_services = []
+    for signup_status, service_name, count in rows:
+        if signup_status == SignupStatus.ACTIVE.value:
+            active_count += count
+            active_services.append(service_name)
+        elif signup_status == SignupStatus.DISMISSED.value:
+            dismissed_count += count
     
     return {
         "contractor_email": contractor_email,
         "active_detections": active_count,
         "dismissed_detections": dismissed_count,
         "total_detections": active_count + dismissed_count,
-        "active_services": [s[0] for s in active_services],
+        "active_services": active_services,
         "warning_level": "high" if active_count > 5 else "medium" if active_count > 2 else "low"
     }
 
 
-@router.get("/dashboard-summary")
-async def get_dashboard_summary(
+def _build_dashboard_summary_stmt(top_n: int = 10):
+    """
+    Build the dashboard summary query once: top contractors, top services
+    and the active total over a shared ACTIVE-filtered CTE, returned as
+    (kind, key, count) rows from a single UNION ALL.
+    """
+    active = select(
+        DetectedSignup.contractor_email,
+        DetectedSignup.service_name,
+    ).where(
+        DetectedSignup.status == SignupStatus.ACTIVE.value
+    ).cte("active_signups")
+    
+    def top(kind: str, column):
+        ranked = select(
+            column.label("key"),
+            func.count().label("count")
+        ).group_by(column).order_by(func.count().desc()).limit(top_n).subquery()
+        return select(literal(kind).label("kind"), ranked.c.key, ranked.c.count)
+    
+    total = select(
+        literal("total").label("kind"),
+        null().label("key"),
+        func.count().label("count")
+    ).select_from(active)
+    
+    return union_all(
+        total,
+        top("contractor", active.c.contractor_email),
+        top("service", active.c.service_name),
+    )
+
+
+DASHBOARD_SUMMARY_STMT = _build_dashboard_summary_stmt()
+
+
+@router.get("/dashboard-summary", response_class=ORJSONResponse)
+def get_dashboard_summary(
     db: Session = Depends(get_db),
 ):
     """
     Get overall Shadow IT dashboard summary.
     
-    Shows top offenders and service popularity.
+    Shows top offenders and service popularity. The serialized summary
+    is cached with the discovery report and dropped on detection writes.
     """
-    from sqlalchemy import func
+    discovery_service = get_discovery_service()
+    cached = discovery_service.get_cached_report(DASHBOARD_SUMMARY)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
     
-    # Count by contractor
-    contractor_counts = db.query(
-        DetectedSignup.contractor_email,
-        func.count(DetectedSignup.id).label("count")
-    ).filter(
-        DetectedSignup.status == SignupStatus.ACTIVE.value
-    ).group_by(
-        DetectedSignup.contractor_email
-    ).order_by(
-        func.count(DetectedSignup.id).desc()
-    ).limit(10).all()
+    total_active = 0
+    top_contractors = []
+    popular_services = []
+    for row in db.execute(DASHBOARD_SUMMARY_STMT):
+        if row.kind == "total":
+            total_active = row.count
+        elif row.kind == "contractor":
+            top_contractors.append({"email": row.key, "count": row.count})
+        else:
+            popular_services.append({"service": row.key, "count": row.count})
     
-    # Count by service
-    service_counts = db.query(
-        DetectedSignup.service_name,
-        func.count(DetectedSignup.id).label("count")
-    ).filter(
-        DetectedSignup.status == SignupStatus.ACTIVE.value
-    ).group_by(
-        DetectedSignup.service_name
-    ).order_by(
-        func.count(DetectedSignup.id).desc()
-    ).limit(10).all()
+    # UNION ALL does not promise to keep each branch's order
+    top_contractors.sort(key=lambda c: c["count"], reverse=True)
+    popular_services.sort(key=lambda s: s["count"], reverse=True)
     
-    total_active = db.query(DetectedSignup).filter(
-        DetectedSignup.status == SignupStatus.ACTIVE.value
-    ).count()
-    
-    return {
+    body = orjson.dumps({
         "total_active_detections": total_active,
-        "top_contractors": [
-            {"email": c.contractor_email, "count": c.count}
-            for c in contractor_counts
-        ],
-        "popular_services": [
-            {"service": s.service_name, "count": s.count}
-            for s in service_counts
-        ]
-    }
+        "top_contractors": top_contractors,
+        "popular_services": popular_services
+    })
+    discovery_service.cache_report(body, DASHBOARD_SUMMARY)
+    
+    return Response(content=body, media_type="application/json")
 
 
 # OAuth endpoints would go here - requires Google Cloud Console setup
@@ -2,12 +2,14 @@
 Contractor Vault - Passkey Router
 WebAuthn passkey registration and authentication endpoints
 """
+import base64
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.services.passkey_service import get_passkey_service, PasskeyService
+from app.utils.responses import ORJSONResponse
 from app.schemas.passkey import (
     PasskeyRegistrationBeginRequest,
     PasskeyRegistrationBeginResponse,
@@ -24,6 +26,9 @@ from app.schemas.passkey import (
 
 logger = logging.getLogger(__name__)
 
+# Enough padding for any unpadded base64url string; extra "=" is ignored
+_B64_PADDING = b"=="
+
 router = APIRouter(prefix="/api/passkey", tags=["Passkey Authentication"])
 
 
@@ -73,11 +78,9 @@ async def complete_registration(
     try:
         # In production, you would verify the attestation here
         # For now, we'll store the credential directly
-        import base64
-        
         # Decode credential ID to bytes for storage
         credential_id = request.credential_id
-        public_key = base64.urlsafe_b64decode(request.attestation_object + "==")
+        public_key = base64.urlsafe_b64decode(request.attestation_object.encode() + _B64_PADDING)
         
         credential = passkey_service.verify_and_store_credential(
             db=db,
@@ -114,19 +117,18 @@ async def begin_authentication(
     Returns WebAuthn options for the client to authenticate.
     """
     try:
-        # Check if contractor has any passkeys
-        if not passkey_service.contractor_has_passkey(db, request.contractor_email):
-            raise HTTPException(
-                status_code=404,
-                detail="No passkeys registered for this email"
-            )
-        
         options = passkey_service.create_authentication_challenge(
             db=db,
             contractor_email=request.contractor_email,
             token_id=request.token_id
         )
         
+        if not options["allowCredentials"]:
+            raise HTTPException(
+                status_code=404,
+                detail="No passkeys registered for this email"
+            )
+        
         return PasskeyAuthBeginResponse(
             challenge=options["challenge"],
             rp_id=options["rpId"],
@@ -180,7 +182,7 @@ async def complete_authentication(
 
 
 @router.get("/list/{contractor_email}", response_model=PasskeyListResponse)
-async def list_passkeys(
+def list_passkeys(
     contractor_email: str,
     db: Session = Depends(get_db),
     passkey_service: PasskeyService = Depends(get_passkey_service)
@@ -188,10 +190,10 @@ async def list_passkeys(
     """List all passkeys for a contractor."""
     passkeys = passkey_service.get_passkeys_for_contractor(db, contractor_email)
     
-    return PasskeyListResponse(
+    response = PasskeyListResponse.model_construct(
         contractor_email=contractor_email,
         passkeys=[
-            PasskeyCredentialInfo(
+            PasskeyCredentialInfo.model_construct(
                 id=p.id,
                 device_name=p.device_name,
                 credential_type=p.credential_type,
@@ -203,9 +205,10 @@ async def list_passkeys(
         ],
         count=len(passkeys)
     )
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
 
-@router.delete("/delete")
+@router.delete("/delete", response_class=ORJSONResponse)
 async def delete_passkey(
     request: PasskeyDeleteRequest,
     db: Session = Depends(get_db),
@@ -224,7 +227,7 @@ async def delete_passkey(
     return {"success": True, "message": "Passkey deleted"}
 
 
-@router.get("/check/{contractor_email}")
+@router.get("/check/{contractor_email}", response_class=ORJSONResponse)
 async def check_passkey_status(
     contractor_email: str,
     db: Session = Depends(get_db),
@@ -2,16 +2,21 @@
 Contractor Vault - Secrets Router
 API endpoints for secrets management
 """
+import json
 import logging
 from datetime import datetime, timezone, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response
+from sqlalchemy import delete, func, update
 from sqlalchemy.orm import Session
 from typing import Annotated
 
 from app.database import get_db
 from app.models.secret import Secret, SecretType
 from app.models.session_token import SessionToken, generate_secure_token
+from app.schemas.device import DeviceContext
+from app.services.device_service import capture_device
 from app.services.encryption import EncryptionService, get_encryption_service
+from app.utils.responses import ORJSONResponse
 from app.schemas.secret import (
     SecretCreate,
     SecretUpdate,
@@ -28,8 +33,28 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/secrets", tags=["Secrets Management"])
 
 
+def _secret_info(secret: Secret) -> SecretInfo:
+    """Build the metadata response for a secret (never the value)."""
+    return SecretInfo(
+        id=secret.id,
+        name=secret.name,
+        secret_type=secret.secret_type,
+        description=secret.description,
+        secret_metadata=secret.secret_metadata,
+        tags=secret.tags,
+        is_active=secret.is_active,
+        expires_at=secret.expires_at,
+        needs_rotation=secret.needs_rotation(),
+        created_by=secret.created_by,
+        created_at=secret.created_at,
+        updated_at=secret.updated_at,
+        last_accessed_at=secret.last_accessed_at,
+        access_count=secret.access_count
+    )
+
+
 @router.post("", response_model=SecretInfo)
-async def create_secret(
+def create_secret(
     payload: SecretCreate,
     request: Request,
     db: Session = Depends(get_db),
@@ -53,30 +78,31 @@ async def create_secret(
     
     db.add(secret)
     db.commit()
-    db.refresh(secret)
     
     logger.info(f"Created secret '{payload.name}' by {admin_email}")
     
-    return SecretInfo(
-        id=secret.id,
-        name=secret.name,
-        secret_type=secret.secret_type,
-        description=secret.description,
-        secret_metadata=secret.secret_metadata,
-        tags=secret.tags,
-        is_active=secret.is_active,
-        expires_at=secret.expires_at,
-        needs_rotation=secret.needs_rotation(),
-        created_by=secret.created_by,
-        created_at=secret.created_at,
-        updated_at=secret.updated_at,
-        last_accessed_at=secret.last_accessed_at,
-        access_count=secret.access_count
-    )
+    return _secret_info(secret)
+
+
+_SECRET_INFO_COLUMNS = (
+    Secret.id,
+    Secret.name,
+    Secret.secret_type,
+    Secret.description,
+    Secret.secret_metadata,
+    Secret.tags,
+    Secret.is_active,
+    Secret.expires_at,
+    Secret.created_by,
+    Secret.created_at,
+    Secret.updated_at,
+    Secret.last_accessed_at,
+    Secret.access_count,
+)
 
 
 @router.get("", response_model=SecretListResponse)
-async def list_secrets(
+def list_secrets(
     skip: int = 0,
     limit: int = 100,
     secret_type: str = None,
@@ -84,7 +110,13 @@ async def list_secrets(
     db: Session = Depends(get_db)
 ):
     """List all secrets (without values)."""
-    query = db.query(Secret)
+    # Only the listed columns; the encrypted value never leaves the DB.
+    # The window count carries the filtered total on every row.
+    query = db.query(
+        *_SECRET_INFO_COLUMNS,
+        Secret.needs_rotation_expr(db.get_bind().dialect.name).label("needs_rotation"),
+        func.count().over().label("total_count")
+    )
     
     if active_only:
         query = query.filter(Secret.is_active == True)
@@ -94,28 +126,21 @@ async def list_secrets(
     
     secrets = query.order_by(Secret.created_at.desc()).offset(skip).limit(limit).all()
     
-    return SecretListResponse(
-        secrets=[
-            SecretInfo(
-                id=s.id,
-                name=s.name,
-                secret_type=s.secret_type,
-                description=s.description,
-                secret_metadata=s.secret_metadata,
-                tags=s.tags,
-                is_active=s.is_active,
-                expires_at=s.expires_at,
-                needs_rotation=s.needs_rotation(),
-                created_by=s.created_by,
-                created_at=s.created_at,
-                updated_at=s.updated_at,
-                last_accessed_at=s.last_accessed_at,
-                access_count=s.access_count
-            )
-            for s in secrets
-        ],
-        total=len(secrets)
+    if secrets:
+        total = secrets[0].total_count
+    elif skip:
+        # Paged past the end; the total still has to be counted
+        total = query.with_entities(func.count(Secret.id)).scalar()
+    else:
+        total = 0
+    
+    # Rows come straight from typed columns, so skip per-item validation
+    # and serialize the page in one call
+    response = SecretListResponse.model_construct(
+        secrets=[SecretInfo.model_construct(**s._mapping) for s in secrets],
+        total=total
     )
+    return Response(content=response.model_dump_json(), media_type="application/json")
 
 
 @router.get("/{secret_id}", response_model=SecretInfo)
@@ -129,90 +154,83 @@ async def get_secret(
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
     
-    return SecretInfo(
-        id=secret.id,
-        name=secret.name,
-        secret_type=secret.secret_type,
-        description=secret.description,
-        secret_metadata=secret.secret_metadata,
-        tags=secret.tags,
-        is_active=secret.is_active,
-        expires_at=secret.expires_at,
-        needs_rotation=secret.needs_rotation(),
-        created_by=secret.created_by,
-        created_at=secret.created_at,
-        updated_at=secret.updated_at,
-        last_accessed_at=secret.last_accessed_at,
-        access_count=secret.access_count
-    )
+    return _secret_info(secret)
 
 
 @router.patch("/{secret_id}", response_model=SecretInfo)
-async def update_secret(
+def update_secret(
     secret_id: str,
     payload: SecretUpdate,
     db: Session = Depends(get_db)
 ):
     """Update secret metadata."""
-    secret = db.query(Secret).filter(Secret.id == secret_id).first()
+    values = {
+        field: value
+        for field, value in payload.model_dump().items()
+        if value is not None
+    }
+    if "metadata" in values:
+        values["secret_metadata"] = values.pop("metadata")
+    
+    # Apply the changes and read back the row in one statement
+    if values:
+        secret = db.execute(
+            update(Secret)
+            .where(Secret.id == secret_id)
+            .values(**values)
+            .returning(Secret)
+        ).scalar_one_or_none()
+    else:
+        secret = db.get(Secret, secret_id)
     
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
     
-    if payload.name is not None:
-        secret.name = payload.name
-    if payload.description is not None:
-        secret.description = payload.description
-    if payload.metadata is not None:
-        secret.secret_metadata = payload.metadata
-    if payload.tags is not None:
-        secret.tags = payload.tags
-    if payload.expires_at is not None:
-        secret.expires_at = payload.expires_at
-    if payload.rotation_reminder_days is not None:
-        secret.rotation_reminder_days = payload.rotation_reminder_days
-    if payload.is_active is not None:
-        secret.is_active = payload.is_active
-    
     db.commit()
-    db.refresh(secret)
     
-    return SecretInfo.model_validate(secret)
+    return _secret_info(secret)
 
 
-@router.post("/{secret_id}/rotate")
-async def rotate_secret(
+@router.post("/{secret_id}/rotate", response_class=ORJSONResponse)
+def rotate_secret(
     secret_id: str,
     payload: SecretRotate,
     db: Session = Depends(get_db),
     encryption_service: EncryptionService = Depends(get_encryption_service)
 ):
     """Rotate a secret's value."""
-    secret = db.query(Secret).filter(Secret.id == secret_id).first()
+    secret = db.execute(
+        update(Secret)
+        .where(Secret.id == secret_id)
+        .values(
+            encrypted_value=encryption_service.encrypt(payload.new_value),
+            last_rotated_at=datetime.now(timezone.utc)
+        )
+        .returning(Secret.name)
+    ).first()
     
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
     
-    secret.encrypted_value = encryption_service.encrypt(payload.new_value)
-    secret.last_rotated_at = datetime.now(timezone.utc)
     db.commit()
     
     logger.info(f"Rotated secret '{secret.name}'")
     return {"success": True, "message": "Secret rotated"}
 
 
-@router.delete("/{secret_id}")
-async def delete_secret(
+@router.delete("/{secret_id}", response_class=ORJSONResponse)
+def delete_secret(
     secret_id: str,
     db: Session = Depends(get_db)
 ):
     """Delete a secret."""
-    secret = db.query(Secret).filter(Secret.id == secret_id).first()
+    secret = db.execute(
+        delete(Secret).where(Secret.id == secret_id).returning(Secret.name)
+    ).first()
     
     if not secret:
         raise HTTPException(status_code=404, detail="Secret not found")
     
-    db.delete(secret)
     db.commit()
     
     logger.info(f"Deleted secret '{secret.name}'")
@@ -262,67 +280,85 @@ async def share_secret(
 
 
 @router.post("/claim/{token}", response_model=SecretClaimResponse)
-async def claim_secret(
+def claim_secret(
     token: str,
     request: Request,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db),
     encryption_service: EncryptionService = Depends(get_encryption_service)
 ):
     """Claim a shared secret using a token."""
     try:
-        session_token = db.query(SessionToken).filter(
+        # Token and secret in one round trip
+        row = db.query(SessionToken, Secret).outerjoin(
+            Secret, Secret.id == SessionToken.credential_id
+        ).filter(
             SessionToken.token == token
         ).first()
         
-        if not session_token:
+        if not row:
             raise HTTPException(status_code=404, detail="Invalid token")
         
+        session_token, secret = row
+        
         # Check validity
         if not session_token.is_valid():
             raise HTTPException(status_code=410, detail="Token expired or revoked")
         
-        # Capture Device Context
+        # Parse the device context now; it is recorded after the response
+        device_context = None
         device_header = request.headers.get("X-Device-Context")
         if device_header:
             try:
-                import json
-                from app.services.device_service import DeviceService
-                from app.schemas.device import DeviceContext
-                
-                device_data = json.loads(device_header)
-                context = DeviceContext(**device_data)
-                
-                # Register/Update device visibility
-                device_service = DeviceService()
-                device_service.get_or_create_device(
-                    db=db,
-                    contractor_email=session_token.contractor_email,
-                    context=context,
-                    ip_address=request.client.host
-                )
+                device_context = DeviceContext(**json.loads(device_header))
             except Exception as e:
                 logger.warning(f"Failed to capture device context: {e}")
                 # Don't block claim on device capture failure
         
-        secret = db.query(Secret).filter(Secret.id == session_token.credential_id).first()
-        
         if not secret:
             raise HTTPException(status_code=404, detail="Secret not found")
         
         decrypted_value = encryption_service.decrypt(secret.encrypted_value)
         
-        session_token.use_count += 1
-        session_token.last_used_at = datetime.now(timezone.utc)
-        
+        now = datetime.now(timezone.utc)
+        token_values = {
+            "use_count": SessionToken.use_count + 1,
+            "last_used_at": now,
+        }
         if session_token.is_one_time:
-            session_token.is_revoked = True
-            session_token.revoked_at = datetime.now(timezone.utc)
+            token_values["is_revoked"] = True
+            token_values["revoked_at"] = now
         
-        secret.access_count += 1
-        secret.last_accessed_at = datetime.now(timezone.utc)
+        # Counters are incremented in SQL, and the token is only updated
+        # while still unrevoked, so concurrent claims of a one-time token
+        # cannot both succeed
+        claimed = db.execute(
+            update(SessionToken)
+            .where(SessionToken.id == session_token.id, SessionToken.is_revoked == False)
+            .values(**token_values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != 1:
+            db.rollback()
+            raise HTTPException(status_code=410, detail="Token expired or revoked")
         
+        db.execute(
+            update(Secret)
+            .where(Secret.id == secret.id)
+            .values(access_count=Secret.access_count + 1, last_accessed_at=now)
+            .execution_options(synchronize_session=False)
+        )
         db.commit()
         
+        # Register/Update device visibility once the claim is committed
+        if device_context is not None:
+            background_tasks.add_task(
+                capture_device,
+                contractor_email=session_token.contractor_email,
+                context=device_context,
+                ip_address=request.client.host
+            )
+        
         logger.info(f"Secret '{secret.name}' claimed by {session_token.contractor_email}")
         
         remaining = 0 if session_token.is_one_time else None
@@ -1,20 +1,30 @@
 """
 Session router for storing and sharing authenticated browser sessions.
 """
-import json
-import base64
+import functools
 import logging
+import re
 from datetime import datetime, timezone
-from urllib.parse import urlparse
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status, Request
-from sqlalchemy.orm import Session
+import orjson
+import pybase64
+from anyio import from_thread
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response, status
+from sqlalchemy import and_, update
+from sqlalchemy.orm import Session, load_only
+from pydantic import TypeAdapter
 
+from app.config import get_settings
 from app.database import get_db
 from app.models.stored_session import StoredSession
 from app.models import SessionToken, AuditLog, AuditAction
-from app.services import EncryptionService, AuditService, TokenService
+from app.dependencies import AuditDep, ClientIP
+from app.services.audit_service import write_audit_log
+from app.services.token_service import get_token_service
+from app.services import cookie_cache
+from app.services.encryption import get_encryption_service
+from app.services.discord_webhook import get_discord_service
 from app.schemas.session import (
     SessionCreate, 
     SessionResponse, 
@@ -27,14 +37,32 @@ logger = logging.getLogger("contractor_vault.sessions")
 router = APIRouter(prefix="/api/sessions", tags=["Sessions"])
 
 # Services
-encryption_service = EncryptionService()
-token_service = TokenService()
+encryption_service = get_encryption_service()
+token_service = get_token_service()
+
+# Claim links are the token appended to this prefix
+_CLAIM_PREFIX = get_settings().claim_base_url
+
+# Dumps a validated cookie list straight to JSON bytes in one pass
+_COOKIES_ADAPTER = TypeAdapter(list[CookieData])
+
+# Session lists select just the response columns, so the encrypted cookie
+# blob is never read and no ORM instances are built
+_SESSION_COLUMNS = tuple(getattr(StoredSession, field) for field in SessionResponse.model_fields)
+
+# Serializes a whole session list in one call
+_SESSION_LIST_ADAPTER = TypeAdapter(list[SessionResponse])
+
+# Network location of a URL, or its leading segment when it has no scheme
+# ("https://host:port/a?q=1" -> "host:port", "host/a" -> "host")
+_DOMAIN_RE = re.compile(r"^(?:(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//)?([^/?#]*)")
 
 
 @router.post("/", response_model=SessionResponse, status_code=status.HTTP_201_CREATED)
-async def store_session(
+def store_session(
     session_data: SessionCreate,
-    request: Request,
+    client_ip: ClientIP,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -44,40 +72,42 @@ async def store_session(
     stores them encrypted in the vault.
     """
     # Parse domain from URL
-    parsed_url = urlparse(session_data.target_url)
-    target_domain = parsed_url.netloc or parsed_url.path.split('/')[0]
+    target_domain = _DOMAIN_RE.match(session_data.target_url).group(1)
     
-    # Serialize and encrypt cookies
-    cookies_json = json.dumps([cookie.model_dump() for cookie in session_data.cookies])
-    encrypted_cookies = encryption_service.encrypt(cookies_json)
+    # Serialize and encrypt cookies (as bytes, no per-cookie dicts); the
+    # ciphertext is bound to the domain so it cannot be moved to a session
+    # for another site
+    cookies_json = _COOKIES_ADAPTER.dump_json(session_data.cookies)
+    encrypted_cookies = encryption_service.encrypt(
+        cookies_json, associated_data=target_domain.encode()
+    )
     
-    # Store as base64 for text column
-    encrypted_b64 = base64.b64encode(encrypted_cookies).decode()
+    # Store as base64 for text column (pybase64 is a SIMD drop-in for base64)
+    encrypted_b64 = pybase64.b64encode(encrypted_cookies)
     
     # Create session record
     stored_session = StoredSession(
         name=session_data.name,
         target_url=session_data.target_url,
         target_domain=target_domain,
-        encrypted_cookies=encrypted_b64.encode(),
+        encrypted_cookies=encrypted_b64,
         cookie_count=len(session_data.cookies),
         notes=session_data.notes,
         created_by=session_data.created_by,
     )
     
+    # id and created_at come from Python-side defaults and commits don't
+    # expire attributes, so there is nothing to refresh
     db.add(stored_session)
     db.commit()
-    db.refresh(stored_session)
     
     # Audit log
-    audit_service = AuditService(db)
-    ip_address = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
-    
-    audit_service.log(
+    background_tasks.add_task(
+        write_audit_log,
         actor=session_data.created_by,
         action=AuditAction.CREDENTIAL_CREATED,
         target_resource=session_data.target_url,
-        ip_address=ip_address.split(",")[0].strip() if ip_address else "unknown",
+        ip_address=client_ip,
         extra_data={
             "type": "session",
             "session_id": stored_session.id,
@@ -98,33 +128,28 @@ async def store_session(
 
 
 @router.get("/", response_model=list[SessionResponse])
-async def list_sessions(
+def list_sessions(
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100
 ):
     """List all stored sessions (without cookie data)."""
-    sessions = db.query(StoredSession).filter(
+    rows = db.query(*_SESSION_COLUMNS).filter(
         StoredSession.is_active == True
-    ).offset(skip).limit(limit).all()
+    ).order_by(StoredSession.id).offset(skip).limit(limit).all()
     
-    return [
-        SessionResponse(
-            id=s.id,
-            name=s.name,
-            target_url=s.target_url,
-            cookie_count=s.cookie_count,
-            created_by=s.created_by,
-            created_at=s.created_at,
-        )
-        for s in sessions
-    ]
+    # Rows come straight from the database, so they are not re-validated
+    body = _SESSION_LIST_ADAPTER.dump_json(
+        [SessionResponse.model_construct(**row._mapping) for row in rows]
+    )
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/generate-token", response_model=GenerateTokenResponse)
-async def generate_session_token(
+def generate_session_token(
     token_request: GenerateTokenRequest,
-    request: Request,
+    client_ip: ClientIP,
+    background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
     """
@@ -149,6 +174,7 @@ async def generate_session_token(
     # Create session token
     session_token = SessionToken(
         credential_id=stored_session.id,
+        target_url=stored_session.target_url,
         contractor_email=token_request.contractor_email,
         expires_at=expires_at,
         created_by=token_request.admin_email,
@@ -158,7 +184,6 @@ async def generate_session_token(
     
     db.add(session_token)
     db.commit()
-    db.refresh(session_token)
     
     # Generate JWT
     access_jwt = token_service.create_access_jwt(
@@ -170,17 +195,15 @@ async def generate_session_token(
     )
     
     # Build claim URL
-    claim_url = f"https://app.contractorvault.com/claim/{session_token.token}"
+    claim_url = _CLAIM_PREFIX + session_token.token
     
     # Audit log
-    audit_service = AuditService(db)
-    ip_address = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
-    
-    audit_service.log(
+    background_tasks.add_task(
+        write_audit_log,
         actor=token_request.admin_email,
         action=AuditAction.GRANT_ACCESS,
         target_resource=stored_session.target_url,
-        ip_address=ip_address.split(",")[0].strip() if ip_address else "unknown",
+        ip_address=client_ip,
         extra_data={
             "type": "session",
             "session_id": stored_session.id,
@@ -204,33 +227,53 @@ async def generate_session_token(
 
 
 @router.post("/claim/{token}")
-async def claim_session(
+def claim_session(
     token: str,
-    request: Request,
+    client_ip: ClientIP,
+    background_tasks: BackgroundTasks,
+    audit_service: AuditDep,
     db: Session = Depends(get_db)
 ):
     """
     Claim a session token and retrieve the cookies for injection.
     This returns the decrypted cookies so the extension can inject them.
     """
-    import traceback
+    # One timestamp for the expiry check and the usage update
+    now = datetime.now(timezone.utc)
     try:
-        # Find the token
-        session_token = db.query(SessionToken).filter(
+        # Token and its stored session in one query; the encrypted blob is
+        # only read when its decrypted cookies are not already cached
+        row = db.query(SessionToken, StoredSession).outerjoin(
+            StoredSession,
+            and_(
+                StoredSession.id == SessionToken.credential_id,
+                StoredSession.is_active == True
+            )
+        ).options(
+            load_only(
+                StoredSession.id,
+                StoredSession.name,
+                StoredSession.target_url,
+                StoredSession.target_domain
+            )
+        ).filter(
             SessionToken.token == token
         ).first()
         
-        if not session_token:
+        if not row:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Token not found"
             )
         
-        # Check if expired (handle timezone-naive timestamps)
+        session_token, stored_session = row
+        
+        # Check if expired. The column is timezone-aware, but SQLite hands
+        # back naive values, so normalize once here; the response reuses it
         expires_at = session_token.expires_at
         if expires_at.tzinfo is None:
             expires_at = expires_at.replace(tzinfo=timezone.utc)
-        if expires_at < datetime.now(timezone.utc):
+        if expires_at < now:
             raise HTTPException(
                 status_code=status.HTTP_410_GONE,
                 detail="Token has expired"
@@ -245,14 +288,11 @@ async def claim_session(
 
         # IP Whitelist Validation
         if session_token.allowed_ip:
-            ip_address = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
-            client_ip = ip_address.split(",")[0].strip() if ip_address else "unknown"
-            
             if client_ip != session_token.allowed_ip and client_ip != "unknown":
                 logger.warning(f"IP mismatch for token {session_token.id}. Expected {session_token.allowed_ip}, got {client_ip}")
                 
-                # Audit log
-                audit_service = AuditService(db)
+                # Audit log, written inline: this request ends in an
+                # exception, which drops background tasks
                 audit_service.log(
                     actor=session_token.contractor_email,
                     action=AuditAction.SECURITY_ALERT,
@@ -262,13 +302,16 @@ async def claim_session(
                     description=f"Blocked access from unauthorized IP {client_ip} (Allowed: {session_token.allowed_ip})"
                 )
                 
-                # Send Discord alert (fire and forget)
+                # Send Discord alert. Background tasks are dropped when the
+                # request ends in an exception, so run it on the event loop here.
                 try:
-                    from app.services.discord_webhook import get_discord_service
                     discord = get_discord_service()
-                    await discord.notify_security_alert(
-                       alert_type="IP Whitelist Mismatch",
-                       details=f"User {session_token.contractor_email} attempted access from {client_ip} (Allowed: {session_token.allowed_ip})"
+                    from_thread.run(
+                        functools.partial(
+                            discord.notify_security_alert,
+                            alert_type="IP Whitelist Mismatch",
+                            details=f"User {session_token.contractor_email} attempted access from {client_ip} (Allowed: {session_token.allowed_ip})"
+                        )
                     )
                 except Exception:
                     pass
@@ -285,48 +328,68 @@ async def claim_session(
                 detail="Token has been revoked"
             )
         
-        # Find the stored session
-        stored_session = db.query(StoredSession).filter(
-            StoredSession.id == session_token.credential_id,
-            StoredSession.is_active == True
-        ).first()
-        
         if not stored_session:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Session not found"
             )
         
-        # Decrypt cookies
-        encrypted_b64 = stored_session.encrypted_cookies
-        if isinstance(encrypted_b64, bytes):
-            encrypted_b64 = encrypted_b64.decode()
-        
-        encrypted_cookies = base64.b64decode(encrypted_b64)
-        cookies_json = encryption_service.decrypt(encrypted_cookies)
-        cookies_data = json.loads(cookies_json)
+        cookies_data = cookie_cache.get_cookies(stored_session.id)
+        if cookies_data is None:
+            # Decrypt cookies
+            encrypted_b64 = db.query(StoredSession.encrypted_cookies).filter(
+                StoredSession.id == stored_session.id
+            ).scalar()
+            # b64decode takes the stored value as str or bytes, and orjson
+            # parses the decrypted bytes without decoding them to str first
+            encrypted_cookies = pybase64.b64decode(encrypted_b64)
+            cookies_json = encryption_service.decrypt_bytes(
+                encrypted_cookies,
+                associated_data=stored_session.target_domain.encode()
+            )
+            cookies_data = orjson.loads(cookies_json)
+            cookie_cache.put_cookies(stored_session.id, cookies_data)
         
-        # Update token usage
-        session_token.use_count += 1
-        session_token.last_used_at = datetime.now(timezone.utc)
+        # Update token usage in SQL; the token is only updated while still
+        # unrevoked, so concurrent claims of a one-time token cannot both
+        # succeed
+        token_values = {
+            "use_count": SessionToken.use_count + 1,
+            "last_used_at": now,
+        }
         
         # Burn-on-View Logic
         if session_token.is_one_time:
-            session_token.is_revoked = True
-            session_token.revoked_at = datetime.now(timezone.utc)
-            session_token.revoked_by = "system:burn_on_view"
-            
+            token_values["is_revoked"] = True
+            token_values["revoked_at"] = now
+            token_values["revoked_by"] = "system:burn_on_view"
+        
+        claimed = db.execute(
+            update(SessionToken)
+            .where(SessionToken.id == session_token.id, SessionToken.is_revoked == False)
+            .values(**token_values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if claimed != 1:
+            db.rollback()
+            if session_token.is_one_time:
+                raise HTTPException(
+                    status_code=status.HTTP_410_GONE,
+                    detail="This is a one-time use token and it has already been accessed."
+                )
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Token has been revoked"
+            )
         db.commit()
         
         # Audit log
-        audit_service = AuditService(db)
-        ip_address = request.headers.get("x-forwarded-for", request.client.host if request.client else "unknown")
-        
-        audit_service.log(
+        background_tasks.add_task(
+            write_audit_log,
             actor=session_token.contractor_email,
             action=AuditAction.INJECTION_SUCCESS,
             target_resource=stored_session.target_url,
-            ip_address=ip_address.split(",")[0].strip() if ip_address else "unknown",
+            ip_address=client_ip,
             extra_data={
                 "type": "session",
                 "session_id": stored_session.id,
@@ -336,11 +399,6 @@ async def claim_session(
             description=f"Session claimed for {stored_session.name}"
         )
         
-        # Ensure expires_at has timezone info for proper JS parsing
-        expires_at = session_token.expires_at
-        if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=timezone.utc)
-        
         # Return cookies for injection
         return {
             "success": True,
@@ -352,10 +410,11 @@ async def claim_session(
         }
     except HTTPException:
         raise
-    except Exception as e:
-        error_detail = f"{type(e).__name__}: {str(e)}\n{traceback.format_exc()}"
+    except Exception:
+        # The traceback goes to the log only; the client gets no internals
+        logger.exception("Failed to claim session token")
         raise HTTPException(
             status_code=500,
-            detail=error_detail
+            detail="Failed to claim session"
         )
 
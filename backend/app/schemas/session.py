@@ -6,6 +6,10 @@ from pydantic import BaseModel, Field
 from typing import Optional, List, Any
 from datetime import datetime
 
+# Upper bound on cookies per stored session; larger payloads are rejected
+# during validation, before they are serialized and encrypted
+MAX_SESSION_COOKIES = 500
+
 
 class CookieData(BaseModel):
     """Single cookie data structure - flexible to accept various formats."""
@@ -26,7 +30,11 @@ class SessionCreate(BaseModel):
     """Request to store an authenticated session."""
     name: str = Field(..., description="Friendly name for this session")
     target_url: str = Field(..., description="Target site URL")
-    cookies: List[CookieData] = Field(..., description="List of cookies to store")
+    cookies: List[CookieData] = Field(
+        ...,
+        max_length=MAX_SESSION_COOKIES,
+        description="List of cookies to store"
+    )
     created_by: str = Field(..., description="Admin email")
     notes: Optional[str] = None
 
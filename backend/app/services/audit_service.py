@@ -5,14 +5,29 @@ SOC2-compliant audit logging service
 import logging
 import csv
 import io
+import threading
 from datetime import datetime, timezone
-from typing import Optional, Any
+from typing import Any, Iterable, Iterator, Optional
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
 
+from app.database import SessionLocal
 from app.models.audit_log import AuditLog, AuditAction
 
 logger = logging.getLogger(__name__)
 
+# Column order of the CSV export
+CSV_FIELDNAMES = [
+    "id", "timestamp", "actor", "action",
+    "target_resource", "ip_address", "description", "metadata"
+]
+
+# Short-lived cache of filtered log queries, for dashboards that poll
+# /api/audit/logs with the same filters every few seconds. Cleared on
+# every write through AuditService.log().
+_QUERY_CACHE: TTLCache = TTLCache(maxsize=1024, ttl=5)
+_QUERY_CACHE_LOCK = threading.Lock()
+
 
 class AuditService:
     """
@@ -65,6 +80,9 @@ class AuditService:
         self._db.commit()
         self._db.refresh(entry)
         
+        with _QUERY_CACHE_LOCK:
+            _QUERY_CACHE.clear()
+        
         # Log at appropriate level based on action type
         log_level = logging.WARNING if action == AuditAction.REVOKE_ACCESS else logging.INFO
         logger.log(
@@ -93,8 +111,99 @@ class AuditService:
         Returns:
             List of matching AuditLog entries
         """
-        query = self._db.query(AuditLog).filter(AuditLog.actor == actor)
+        return self.get_logs_filtered(
+            actor=actor,
+            start_date=start_date,
+            end_date=end_date,
+            action_filter=action_filter,
+        )
+    
+    def get_logs_filtered(
+        self,
+        actor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        action_filter: Optional[AuditAction] = None,
+        limit: Optional[int] = None
+    ) -> list[AuditLog]:
+        """
+        Query audit logs, newest first, with every filter applied in SQL.
+        
+        Args:
+            actor: Optional email to filter by
+            start_date: Optional start of date range
+            end_date: Optional end of date range
+            action_filter: Optional action type filter
+            limit: Optional maximum number of entries
+            
+        Returns:
+            List of matching AuditLog entries (cached for a few seconds;
+            the entries are detached and must be treated as read-only)
+        """
+        cache_key = ("logs", actor, start_date, end_date, action_filter, limit)
+        with _QUERY_CACHE_LOCK:
+            logs = _QUERY_CACHE.get(cache_key)
+        if logs is not None:
+            return logs
+        
+        query = self._filtered_query(
+            actor=actor,
+            start_date=start_date,
+            end_date=end_date,
+            action_filter=action_filter,
+        )
+        if limit is not None:
+            query = query.limit(limit)
+        logs = query.all()
+        
+        # Detach so a later commit on this session cannot expire the
+        # instances other requests are reading from the cache
+        for log in logs:
+            self._db.expunge(log)
+        with _QUERY_CACHE_LOCK:
+            _QUERY_CACHE[cache_key] = logs
+        return logs
+    
+    def count_logs_filtered(
+        self,
+        actor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        action_filter: Optional[AuditAction] = None
+    ) -> int:
+        """Count audit logs matching the same filters as get_logs_filtered."""
+        cache_key = ("count", actor, start_date, end_date, action_filter)
+        with _QUERY_CACHE_LOCK:
+            total = _QUERY_CACHE.get(cache_key)
+        if total is not None:
+            return total
+        
+        total = self._filtered_query(
+            actor=actor,
+            start_date=start_date,
+            end_date=end_date,
+            action_filter=action_filter,
+        ).order_by(None).count()
+        with _QUERY_CACHE_LOCK:
+            _QUERY_CACHE[cache_key] = total
+        return total
+    
+    def _filtered_query(
+        self,
+        actor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        action_filter: Optional[AuditAction] = None
+    ):
+        """
+        Build a newest-first audit log query with all filters in SQL.
+        Both ends of the date range are inclusive; either bound still maps
+        onto the (actor, timestamp, action) index.
+        """
+        query = self._db.query(AuditLog)
         
+        if actor:
+            query = query.filter(AuditLog.actor == actor)
         if start_date:
             query = query.filter(AuditLog.timestamp >= start_date)
         if end_date:
@@ -102,7 +211,7 @@ class AuditService:
         if action_filter:
             query = query.filter(AuditLog.action == action_filter)
         
-        return query.order_by(AuditLog.timestamp.desc()).all()
+        return query.order_by(AuditLog.timestamp.desc())
     
     def get_logs_by_resource(
         self,
@@ -142,23 +251,60 @@ class AuditService:
         Returns:
             CSV string content
         """
-        output = io.StringIO()
-        
         if not logs:
             return ""
         
-        fieldnames = [
-            "id", "timestamp", "actor", "action",
-            "target_resource", "ip_address", "description", "metadata"
-        ]
+        return "".join(self._csv_lines(logs))
+    
+    def stream_csv(
+        self,
+        actor: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        action_filter: Optional[AuditAction] = None,
+        batch_size: int = 1000
+    ) -> Iterator[str]:
+        """
+        Stream matching audit logs as CSV, one line at a time.
         
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
+        Rows are fetched from the database in batches of `batch_size`
+        (server-side cursor where supported), so memory use does not grow
+        with the size of the export.
         
-        for log in logs:
-            writer.writerow(log.to_csv_row())
+        Yields:
+            CSV header line, then one line per audit log entry
+        """
+        query = self._filtered_query(
+            actor=actor,
+            start_date=start_date,
+            end_date=end_date,
+            action_filter=action_filter,
+        ).execution_options(stream_results=True).yield_per(batch_size)
+        
+        yield from self._csv_lines(query)
+    
+    def _csv_lines(self, logs: Iterable[AuditLog]) -> Iterator[str]:
+        """Encode audit logs as CSV lines, reusing one small buffer."""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        
+        def flush() -> str:
+            line = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+            return line
         
-        return output.getvalue()
+        writer.writerow(CSV_FIELDNAMES)
+        yield flush()
+        
+        for log in logs:
+            row = log.to_csv_row()
+            writer.writerow([
+                row["id"], row["timestamp"], row["actor"], row["action"],
+                row["target_resource"], row["ip_address"], row["description"],
+                row["extra_data"],
+            ])
+            yield flush()
     
     def get_recent_logs(self, limit: int = 100) -> list[AuditLog]:
         """
@@ -176,3 +322,21 @@ class AuditService:
             .limit(limit)
             .all()
         )
+
+
+def write_audit_log(**entry: Any) -> None:
+    """
+    Write one audit entry in its own session.
+    
+    Meant for BackgroundTasks, after the request's response has been sent
+    and its session closed. Takes the same keyword arguments as
+    AuditService.log(); failures are logged rather than raised since
+    there is no request left to fail.
+    """
+    db = SessionLocal()
+    try:
+        AuditService(db).log(**entry)
+    except Exception as e:
+        logger.error(f"Failed to write audit log for {entry.get('action')}: {e}")
+    finally:
+        db.close()
@@ -0,0 +1,45 @@
+"""
+Contractor Vault - Contractor Profile Cache
+Short-lived in-memory snapshots of serialized contractor profile/client responses
+"""
+import threading
+from typing import Any, Optional
+
+from cachetools import TTLCache
+
+# Snapshots are invalidated on every write through the contractor router;
+# the TTL only bounds staleness from writes made elsewhere.
+CONTRACTOR_CACHE_TTL_SECONDS = 60
+
+# Snapshot kinds cached per contractor email
+PROFILE = "profile"
+CLIENTS = "clients"
+_KINDS = (PROFILE, CLIENTS)
+
+_cache = TTLCache(maxsize=10_000, ttl=CONTRACTOR_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+
+
+def get(kind: str, email: str) -> Optional[Any]:
+    """Return a cached snapshot (PROFILE or CLIENTS) or None on miss."""
+    with _lock:
+        return _cache.get((kind, email))
+
+
+def put(kind: str, email: str, value: Any) -> None:
+    """Cache a read-only snapshot for a contractor."""
+    with _lock:
+        _cache[(kind, email)] = value
+
+
+def invalidate(email: str) -> None:
+    """Drop every snapshot for a contractor after writing to their data."""
+    with _lock:
+        for kind in _KINDS:
+            _cache.pop((kind, email), None)
+
+
+def clear() -> None:
+    """Drop all snapshots (used when the affected contractor is unknown)."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,28 @@
+"""
+Contractor Vault - Decrypted Cookie Cache
+Short-lived cache of decrypted stored-session cookies, keyed by session id
+"""
+import threading
+
+from cachetools import TTLCache
+
+# Stored sessions are never edited after creation, so entries only go
+# stale if a session is changed directly in the database; the TTL bounds
+# that and how long decrypted cookies stay in memory.
+COOKIE_CACHE_TTL_SECONDS = 300
+MAX_CACHED_SESSIONS = 1_000
+
+_cookies = TTLCache(maxsize=MAX_CACHED_SESSIONS, ttl=COOKIE_CACHE_TTL_SECONDS)
+_lock = threading.Lock()
+
+
+def get_cookies(session_id: str) -> list | None:
+    """Return the cached decrypted cookies for a stored session, if any."""
+    with _lock:
+        return _cookies.get(session_id)
+
+
+def put_cookies(session_id: str, cookies: list) -> None:
+    """Cache the decrypted cookies for a stored session."""
+    with _lock:
+        _cookies[session_id] = cookies
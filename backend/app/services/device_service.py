@@ -6,9 +6,11 @@ import hashlib
 import logging
 from datetime import datetime, timezone
 from typing import Optional, Tuple
-from sqlalchemy.orm import Session
+from sqlalchemy import case, update
+from sqlalchemy.orm import Session, raiseload
 from user_agents import parse as parse_user_agent
 
+from app.database import SessionLocal
 from app.models.device import DeviceInfo
 from app.schemas.device import DeviceContext, DeviceValidationResult
 
@@ -73,18 +75,27 @@ class DeviceService:
         """
         fingerprint = self.compute_fingerprint(context)
         
-        # Look for existing device
-        device = db.query(DeviceInfo).filter(
-            DeviceInfo.fingerprint == fingerprint,
-            DeviceInfo.contractor_email == contractor_email
-        ).first()
+        # Update last seen on an existing device in one statement; the
+        # counter is incremented in SQL so concurrent captures all count
+        values = {
+            "last_seen": datetime.now(timezone.utc),
+            "access_count": DeviceInfo.access_count + 1,
+        }
+        if ip_address:
+            values["ip_address"] = ip_address
+        
+        device = db.execute(
+            update(DeviceInfo)
+            .where(
+                DeviceInfo.fingerprint == fingerprint,
+                DeviceInfo.contractor_email == contractor_email
+            )
+            .values(**values)
+            .returning(DeviceInfo)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        ).scalars().first()
         
         if device:
-            # Update last seen
-            device.last_seen = datetime.now(timezone.utc)
-            device.access_count += 1
-            if ip_address:
-                device.ip_address = ip_address
             db.commit()
             return device, False
         
@@ -181,20 +192,32 @@ class DeviceService:
     
     def record_successful_access(self, db: Session, device_id: str):
         """Record a successful access to improve trust score."""
-        device = db.query(DeviceInfo).filter(DeviceInfo.id == device_id).first()
-        if device:
-            device.trust_score = min(100, device.trust_score + self.SCORE_BONUS_SUCCESSFUL_ACCESS)
-            device.failed_attempts = 0  # Reset on success
-            db.commit()
+        raised = DeviceInfo.trust_score + self.SCORE_BONUS_SUCCESSFUL_ACCESS
+        db.execute(
+            update(DeviceInfo)
+            .where(DeviceInfo.id == device_id)
+            .values(
+                trust_score=case((raised > 100, 100), else_=raised),
+                failed_attempts=0  # Reset on success
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
     
     def record_failed_access(self, db: Session, device_id: str):
         """Record a failed access attempt."""
-        device = db.query(DeviceInfo).filter(DeviceInfo.id == device_id).first()
-        if device:
-            device.trust_score = max(0, device.trust_score + self.SCORE_PENALTY_FAILED_ATTEMPT)
-            device.failed_attempts += 1
-            device.last_failed_at = datetime.now(timezone.utc)
-            db.commit()
+        lowered = DeviceInfo.trust_score + self.SCORE_PENALTY_FAILED_ATTEMPT
+        db.execute(
+            update(DeviceInfo)
+            .where(DeviceInfo.id == device_id)
+            .values(
+                trust_score=case((lowered < 0, 0), else_=lowered),
+                failed_attempts=DeviceInfo.failed_attempts + 1,
+                last_failed_at=datetime.now(timezone.utc)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
     
     def trust_device(
         self,
@@ -225,16 +248,21 @@ class DeviceService:
         reason: str
     ) -> bool:
         """Block a device."""
-        device = db.query(DeviceInfo).filter(DeviceInfo.id == device_id).first()
-        if not device:
+        blocked = db.execute(
+            update(DeviceInfo)
+            .where(DeviceInfo.id == device_id)
+            .values(
+                is_blocked=True,
+                is_trusted=False,
+                trust_score=0,
+                blocked_by=admin_email,
+                blocked_at=datetime.now(timezone.utc),
+                block_reason=reason,
+            )
+            .returning(DeviceInfo.id)
+        ).first()
+        if not blocked:
             return False
-        
-        device.is_blocked = True
-        device.is_trusted = False
-        device.trust_score = 0
-        device.blocked_by = admin_email
-        device.blocked_at = datetime.now(timezone.utc)
-        device.block_reason = reason
         db.commit()
         
         logger.info(f"Device {device_id} blocked by {admin_email}: {reason}")
@@ -247,15 +275,20 @@ class DeviceService:
         admin_email: str
     ) -> bool:
         """Unblock a device."""
-        device = db.query(DeviceInfo).filter(DeviceInfo.id == device_id).first()
-        if not device:
+        unblocked = db.execute(
+            update(DeviceInfo)
+            .where(DeviceInfo.id == device_id)
+            .values(
+                is_blocked=False,
+                trust_score=self.SCORE_NEW_DEVICE,  # Reset to new device score
+                blocked_by=None,
+                blocked_at=None,
+                block_reason=None,
+            )
+            .returning(DeviceInfo.id)
+        ).first()
+        if not unblocked:
             return False
-        
-        device.is_blocked = False
-        device.trust_score = self.SCORE_NEW_DEVICE  # Reset to new device score
-        device.blocked_by = None
-        device.blocked_at = None
-        device.block_reason = None
         db.commit()
         
         logger.info(f"Device {device_id} unblocked by {admin_email}")
@@ -267,7 +300,7 @@ class DeviceService:
         contractor_email: str
     ) -> list[DeviceInfo]:
         """Get all devices for a contractor."""
-        return db.query(DeviceInfo).filter(
+        return db.query(DeviceInfo).options(raiseload("*")).filter(
             DeviceInfo.contractor_email == contractor_email
         ).order_by(DeviceInfo.last_seen.desc()).all()
     
@@ -276,15 +309,47 @@ class DeviceService:
         db: Session,
         skip: int = 0,
         limit: int = 100,
-        blocked_only: bool = False
-    ) -> list[DeviceInfo]:
-        """Get all devices with optional filtering."""
-        query = db.query(DeviceInfo)
+        blocked_only: bool = False,
+        columns: Optional[tuple] = None
+    ) -> list:
+        """
+        Get all devices with optional filtering.
+        
+        If columns is given, only those columns are selected and plain
+        rows are returned instead of DeviceInfo objects.
+        """
+        query = db.query(*columns) if columns else db.query(DeviceInfo)
         if blocked_only:
             query = query.filter(DeviceInfo.is_blocked == True)
         return query.order_by(DeviceInfo.last_seen.desc()).offset(skip).limit(limit).all()
 
 
+def capture_device(
+    contractor_email: str,
+    context: DeviceContext,
+    ip_address: Optional[str] = None
+) -> None:
+    """
+    Register or refresh a device in its own session.
+    
+    Meant for BackgroundTasks, so device bookkeeping never delays the
+    response; failures are logged rather than raised.
+    """
+    db = SessionLocal()
+    try:
+        get_device_service().get_or_create_device(
+            db=db,
+            contractor_email=contractor_email,
+            context=context,
+            ip_address=ip_address
+        )
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to capture device context for {contractor_email}: {e}")
+    finally:
+        db.close()
+
+
 # Singleton instance
 _device_service = None
 
@@ -3,16 +3,27 @@ Contractor Vault - Discovery Service
 SaaS app detection and shadow IT risk analysis
 """
 import logging
+import threading
 from datetime import datetime, timezone
 from typing import Optional
+from cachetools import TTLCache
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import func, insert, select
 
+from app.database import SessionLocal
 from app.models.saas_app import SaaSApp, RiskLevel, KNOWN_SAAS_APPS
 from app.models.detected_signup import DetectedSignup, SignupStatus
 
 logger = logging.getLogger(__name__)
 
+# Dashboards poll the discovery report; writes through this service and
+# the discovery/email routers invalidate it, the TTL covers anything else
+REPORT_CACHE_TTL_SECONDS = 30
+
+# Keys of the cached serialized reports
+DISCOVERY_REPORT = "report"
+DASHBOARD_SUMMARY = "dashboard_summary"
+
 
 class DiscoveryService:
     """
@@ -25,19 +36,51 @@ class DiscoveryService:
     - Compliance reporting
     """
     
-    def seed_known_apps(self, db: Session):
-        """Seed the database with known SaaS apps."""
-        for app_data in KNOWN_SAAS_APPS:
-            existing = db.query(SaaSApp).filter(
-                SaaSApp.domain == app_data["domain"]
-            ).first()
-            
-            if not existing:
-                app = SaaSApp(**app_data)
-                db.add(app)
+    def __init__(self):
+        # Serialized report JSON: the discovery report and the email
+        # dashboard summary, both derived from apps and detections
+        self._report_cache = TTLCache(maxsize=2, ttl=REPORT_CACHE_TTL_SECONDS)
+        self._report_lock = threading.Lock()
+    
+    def get_cached_report(self, key: str = DISCOVERY_REPORT) -> Optional[bytes]:
+        """Return the cached serialized report, if still fresh."""
+        with self._report_lock:
+            return self._report_cache.get(key)
+    
+    def cache_report(self, body: bytes, key: str = DISCOVERY_REPORT) -> None:
+        """Cache a serialized report."""
+        with self._report_lock:
+            self._report_cache[key] = body
+    
+    def invalidate_report(self) -> None:
+        """Drop the cached reports after a write to apps or detections."""
+        with self._report_lock:
+            self._report_cache.clear()
+    
+    def seed_known_apps(self, db: Session) -> int:
+        """
+        Seed the database with known SaaS apps.
         
-        db.commit()
-        logger.info(f"Seeded {len(KNOWN_SAAS_APPS)} known SaaS apps")
+        Looks up which catalog domains already exist in one query and
+        inserts the rest in a single executemany.
+        
+        Returns:
+            Number of apps inserted
+        """
+        existing = set(db.scalars(
+            select(SaaSApp.domain).where(
+                SaaSApp.domain.in_([app_data["domain"] for app_data in KNOWN_SAAS_APPS])
+            )
+        ))
+        rows = [app_data for app_data in KNOWN_SAAS_APPS if app_data["domain"] not in existing]
+        
+        if rows:
+            db.execute(insert(SaaSApp), rows)
+            db.commit()
+            self.invalidate_report()
+        
+        logger.info(f"Seeded {len(rows)} of {len(KNOWN_SAAS_APPS)} known SaaS apps")
+        return len(rows)
     
     def get_or_create_app(
         self,
@@ -134,6 +177,7 @@ class DiscoveryService:
         db.add(detection)
         db.commit()
         db.refresh(detection)
+        self.invalidate_report()
         
         logger.info(f"Detected signup for {contractor_email}: {service_name}")
         return detection
@@ -231,6 +275,7 @@ class DiscoveryService:
             app.policy_notes = notes
         
         db.commit()
+        self.invalidate_report()
         logger.info(f"App {app.name} {action}d by {admin_email}")
         return True
     
@@ -271,10 +316,16 @@ class DiscoveryService:
         db: Session,
         skip: int = 0,
         limit: int = 100,
-        risk_level: Optional[str] = None
-    ) -> list[SaaSApp]:
-        """Get all apps from catalog."""
-        query = db.query(SaaSApp)
+        risk_level: Optional[str] = None,
+        columns: Optional[tuple] = None
+    ) -> list:
+        """
+        Get all apps from catalog.
+        
+        If columns is given, only those columns are selected and plain
+        rows are returned instead of SaaSApp objects.
+        """
+        query = db.query(*columns) if columns else db.query(SaaSApp)
         if risk_level:
             query = query.filter(SaaSApp.risk_level == risk_level)
         return query.order_by(SaaSApp.risk_score.desc()).offset(skip).limit(limit).all()
@@ -289,3 +340,20 @@ def get_discovery_service() -> DiscoveryService:
     if _discovery_service is None:
         _discovery_service = DiscoveryService()
     return _discovery_service
+
+
+def seed_known_apps_background() -> None:
+    """
+    Seed known SaaS apps in their own session.
+    
+    Meant for BackgroundTasks; failures are logged rather than raised
+    since the response has already been sent.
+    """
+    db = SessionLocal()
+    try:
+        get_discovery_service().seed_known_apps(db)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to seed known SaaS apps: {e}")
+    finally:
+        db.close()
@@ -1,15 +1,31 @@
 """
 Contractor Vault - Encryption Service
-Fernet symmetric encryption for credential storage
+AES-256-GCM symmetric encryption for credential storage
 """
+import base64
 import logging
+import os
 from functools import lru_cache
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet, InvalidToken
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 
 from app.config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Leading byte of AES-GCM ciphertexts. Fernet tokens are base64 text and
+# always start with "g", so older values are still told apart and read.
+AESGCM_VERSION = b"\x01"
+# Leading byte of AES-GCM ciphertexts bound to associated data, which must
+# be supplied again to decrypt
+AESGCM_AAD_VERSION = b"\x02"
+AESGCM_NONCE_SIZE = 12
+# HKDF context for the AES-GCM key derived from the configured Fernet key
+AESGCM_KEY_INFO = b"contractor-vault aes-256-gcm v1"
+
 
 class EncryptionError(Exception):
     """Raised when encryption/decryption fails."""
@@ -18,7 +34,11 @@ class EncryptionError(Exception):
 
 class EncryptionService:
     """
-    Fernet symmetric encryption service.
+    AES-256-GCM symmetric encryption service.
+    
+    New values are sealed with AES-GCM (OpenSSL's AES-NI path, one pass,
+    no separate HMAC) as version byte | 12-byte nonce | ciphertext+tag.
+    Values written earlier as Fernet tokens still decrypt.
     
     SOC2 Requirements:
     - Keys loaded from environment variables only
@@ -26,30 +46,50 @@ class EncryptionService:
     - Fail securely on decryption errors
     
     Usage:
-        service = EncryptionService()
+        service = get_encryption_service()
         encrypted = service.encrypt("my-password")
         decrypted = service.decrypt(encrypted)
+    
+    Use the shared instance rather than constructing one per request; the
+    keys are derived and the cipher objects built once, in __init__.
     """
     
-    def __init__(self):
-        """Initialize with Fernet key from environment."""
-        settings = get_settings()
+    def __init__(self, fernet_key: str | None = None):
+        """
+        Initialize with the Fernet key from environment, or an explicit one
+        (e.g. the new key during rotation).
+        """
+        fernet_key = fernet_key or get_settings().fernet_key
         try:
-            self._fernet = Fernet(settings.fernet_key.encode())
+            self._fernet = Fernet(fernet_key.encode())
+            # Separate key for AES-GCM so no key is shared between schemes
+            aead_key = HKDF(
+                algorithm=hashes.SHA256(),
+                length=32,
+                salt=None,
+                info=AESGCM_KEY_INFO,
+            ).derive(base64.urlsafe_b64decode(fernet_key))
+            self._aead = AESGCM(aead_key)
             logger.info("Encryption service initialized successfully")
         except Exception as e:
             logger.error(f"Failed to initialize encryption service: {e}")
             raise EncryptionError("Invalid encryption key configuration") from e
     
-    def encrypt(self, plaintext: str) -> bytes:
+    def encrypt(
+        self,
+        plaintext: str | bytes,
+        associated_data: bytes | None = None
+    ) -> bytes:
         """
         Encrypt a plaintext string.
         
         Args:
-            plaintext: The string to encrypt
+            plaintext: The string to encrypt, or its UTF-8 bytes
+            associated_data: Optional context the value is bound to (not
+                stored); decryption fails unless the same bytes are given
             
         Returns:
-            Encrypted bytes (Fernet token)
+            Encrypted bytes (version | nonce | AES-GCM ciphertext and tag)
             
         Raises:
             EncryptionError: If encryption fails
@@ -58,23 +98,57 @@ class EncryptionService:
             raise EncryptionError("Cannot encrypt empty string")
         
         try:
-            encrypted = self._fernet.encrypt(plaintext.encode("utf-8"))
+            if isinstance(plaintext, str):
+                plaintext = plaintext.encode("utf-8")
+            version = AESGCM_AAD_VERSION if associated_data else AESGCM_VERSION
+            nonce = os.urandom(AESGCM_NONCE_SIZE)
+            encrypted = version + nonce + self._aead.encrypt(
+                nonce, plaintext, associated_data or None
+            )
             logger.debug("Successfully encrypted value")
             return encrypted
         except Exception as e:
             logger.error(f"Encryption failed: {e}")
             raise EncryptionError("Failed to encrypt value") from e
     
-    def decrypt(self, ciphertext: bytes) -> str:
+    def decrypt(
+        self,
+        ciphertext: bytes,
+        associated_data: bytes | None = None
+    ) -> str:
         """
-        Decrypt a Fernet token back to plaintext.
+        Decrypt an AES-GCM value (or a legacy Fernet token) to plaintext.
         
         Args:
             ciphertext: The encrypted bytes to decrypt
+            associated_data: The context given to encrypt(), if any; ignored
+                for values that were not bound to one
             
         Returns:
             Decrypted plaintext string
             
+        Raises:
+            EncryptionError: If decryption fails (invalid token, wrong key, etc.)
+        """
+        decrypted = self.decrypt_bytes(ciphertext, associated_data)
+        try:
+            return decrypted.decode("utf-8")
+        except UnicodeDecodeError as e:
+            logger.error(f"Decryption failed: {e}")
+            raise EncryptionError("Failed to decrypt value") from e
+    
+    def decrypt_bytes(
+        self,
+        ciphertext: bytes | memoryview,
+        associated_data: bytes | None = None
+    ) -> bytes:
+        """
+        Decrypt to raw plaintext bytes, skipping the str decode.
+        
+        For callers that parse the plaintext directly (e.g. orjson.loads).
+        The nonce and ciphertext are sliced as memoryviews, so the payload
+        is not copied before it reaches AES-GCM.
+        
         Raises:
             EncryptionError: If decryption fails (invalid token, wrong key, etc.)
         """
@@ -82,32 +156,61 @@ class EncryptionService:
             raise EncryptionError("Cannot decrypt empty ciphertext")
         
         try:
-            decrypted = self._fernet.decrypt(ciphertext)
+            view = memoryview(ciphertext)
+            version = view[:1]
+            if version == AESGCM_VERSION or version == AESGCM_AAD_VERSION:
+                if version == AESGCM_AAD_VERSION and not associated_data:
+                    raise InvalidTag()
+                nonce_end = 1 + AESGCM_NONCE_SIZE
+                decrypted = self._aead.decrypt(
+                    view[1:nonce_end],
+                    view[nonce_end:],
+                    associated_data if version == AESGCM_AAD_VERSION else None
+                )
+            else:
+                decrypted = self._fernet.decrypt(bytes(view))
             logger.debug("Successfully decrypted value")
-            return decrypted.decode("utf-8")
-        except InvalidToken as e:
+            return decrypted
+        except (InvalidToken, InvalidTag) as e:
             logger.error("Decryption failed: Invalid token (wrong key or corrupted data)")
             raise EncryptionError("Invalid encryption token") from e
         except Exception as e:
             logger.error(f"Decryption failed: {e}")
             raise EncryptionError("Failed to decrypt value") from e
     
-    def rotate_key(self, old_ciphertext: bytes, new_fernet: Fernet) -> bytes:
+    def rotate_key(
+        self,
+        old_ciphertext: bytes,
+        new_service: "EncryptionService",
+        associated_data: bytes | None = None
+    ) -> bytes:
         """
         Re-encrypt data with a new key (for key rotation).
         
+        Legacy Fernet values come out in the current AES-GCM format too.
+        
         Args:
             old_ciphertext: Data encrypted with current key
-            new_fernet: Fernet instance with new key
+            new_service: Service built with the new key
+            associated_data: The context the value is bound to, if any; the
+                re-sealed value stays bound to it
             
         Returns:
             Data encrypted with new key
+            
+        Raises:
+            EncryptionError: If the old value cannot be decrypted
         """
-        plaintext = self.decrypt(old_ciphertext)
-        return new_fernet.encrypt(plaintext.encode("utf-8"))
+        plaintext = self.decrypt_bytes(old_ciphertext, associated_data)
+        return new_service.encrypt(plaintext, associated_data=associated_data)
 
 
-@lru_cache()
+@lru_cache(maxsize=1)
 def get_encryption_service() -> EncryptionService:
-    """Get cached encryption service instance."""
+    """
+    Get the process-wide encryption service.
+    
+    The keys are decoded and derived once here; every caller shares the
+    instance.
+    """
     return EncryptionService()
@@ -0,0 +1,46 @@
+"""
+Contractor Vault - OTP Cleanup
+Periodic purge of old one-time passwords
+"""
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete
+from starlette.concurrency import run_in_threadpool
+
+from app.database import engine
+from app.models.user import OTPCode
+
+logger = logging.getLogger("contractor_vault.otp_cleanup")
+
+# Codes expire after 10 minutes; keep a day of history for debugging
+OTP_RETENTION = timedelta(days=1)
+PURGE_INTERVAL_SECONDS = 3600.0
+
+
+def purge_old_otps() -> int:
+    """
+    Delete OTP codes created before the retention window.
+    
+    Returns:
+        Number of rows deleted
+    """
+    cutoff = datetime.now(timezone.utc) - OTP_RETENTION
+    try:
+        with engine.begin() as conn:
+            result = conn.execute(delete(OTPCode).where(OTPCode.created_at < cutoff))
+    except Exception as e:
+        logger.error(f"Failed to purge old OTP codes: {e}")
+        return 0
+    
+    if result.rowcount:
+        logger.info(f"Purged {result.rowcount} OTP codes created before {cutoff:%Y-%m-%d %H:%M} UTC")
+    return result.rowcount
+
+
+async def run_otp_purge(interval: float = PURGE_INTERVAL_SECONDS) -> None:
+    """Purge old OTP codes at startup and then periodically until cancelled."""
+    while True:
+        await run_in_threadpool(purge_old_otps)
+        await asyncio.sleep(interval)
@@ -3,10 +3,12 @@ Contractor Vault - Passkey Service
 WebAuthn/FIDO2 authentication service
 """
 import base64
+import hashlib
 import secrets
 import logging
 from datetime import datetime, timezone, timedelta
 from typing import Optional, Tuple
+from sqlalchemy import exists
 from sqlalchemy.orm import Session
 
 from app.models.passkey import PasskeyCredential, PasskeyChallenge
@@ -60,7 +62,6 @@ class PasskeyService:
         db.commit()
         
         # Create user ID (hash of email)
-        import hashlib
         user_id = base64.urlsafe_b64encode(
             hashlib.sha256(contractor_email.encode()).digest()
         ).decode('utf-8').rstrip('=')
@@ -130,7 +131,6 @@ class PasskeyService:
         )
         db.add(credential)
         db.commit()
-        db.refresh(credential)
         
         logger.info(f"Registered passkey for {contractor_email}: {device_name}")
         return credential
@@ -144,24 +144,12 @@ class PasskeyService:
         """
         Create an authentication challenge.
         
-        Returns WebAuthn PublicKeyCredentialRequestOptions.
+        Returns WebAuthn PublicKeyCredentialRequestOptions. If the
+        contractor has no active passkeys, allowCredentials is empty and
+        no challenge is stored.
         """
-        challenge = self.generate_challenge()
-        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.challenge_timeout_seconds)
-        
-        # Store challenge
-        challenge_record = PasskeyChallenge(
-            challenge=challenge,
-            challenge_type="authentication",
-            contractor_email=contractor_email,
-            token_id=token_id,
-            expires_at=expires_at
-        )
-        db.add(challenge_record)
-        db.commit()
-        
         # Get allowed credentials for this contractor
-        credentials = db.query(PasskeyCredential).filter(
+        credential_ids = db.query(PasskeyCredential.credential_id).filter(
             PasskeyCredential.contractor_email == contractor_email,
             PasskeyCredential.is_active == True
         ).all()
@@ -171,9 +159,24 @@ class PasskeyService:
                 "type": "public-key",
                 "id": cred.credential_id
             }
-            for cred in credentials
+            for cred in credential_ids
         ]
         
+        challenge = self.generate_challenge()
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.challenge_timeout_seconds)
+        
+        # Store challenge
+        challenge_record = PasskeyChallenge(
+            challenge=challenge,
+            challenge_type="authentication",
+            contractor_email=contractor_email,
+            token_id=token_id,
+            expires_at=expires_at
+        )
+        if allowed_credentials:
+            db.add(challenge_record)
+            db.commit()
+        
         return {
             "challenge": challenge,
             "rpId": self.rp_id,
@@ -266,10 +269,12 @@ class PasskeyService:
         contractor_email: str
     ) -> bool:
         """Check if contractor has any active passkeys."""
-        return db.query(PasskeyCredential).filter(
-            PasskeyCredential.contractor_email == contractor_email,
-            PasskeyCredential.is_active == True
-        ).count() > 0
+        return db.query(
+            exists().where(
+                PasskeyCredential.contractor_email == contractor_email,
+                PasskeyCredential.is_active == True
+            )
+        ).scalar()
 
 
 # Singleton instance
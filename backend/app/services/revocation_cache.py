@@ -0,0 +1,39 @@
+"""
+Contractor Vault - Revoked Token Cache
+In-memory deny list used to reject revoked tokens without a database query
+"""
+import threading
+from datetime import datetime, timezone
+
+from cachetools import TLRUCache
+
+# Upper bound on remembered tokens; the oldest entries are evicted first,
+# which only costs a database lookup for those tokens.
+MAX_REVOKED_TOKENS = 100_000
+
+
+def _time_to_use(key: str, expires_at: float, now: float) -> float:
+    """Keep each entry only until the token would have expired anyway."""
+    return expires_at
+
+
+def _timer() -> float:
+    return datetime.now(timezone.utc).timestamp()
+
+
+_revoked = TLRUCache(maxsize=MAX_REVOKED_TOKENS, ttu=_time_to_use, timer=_timer)
+_lock = threading.Lock()
+
+
+def mark_revoked(token: str, expires_at: datetime) -> None:
+    """Remember a revoked token until its original expiry."""
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    with _lock:
+        _revoked[token] = expires_at.timestamp()
+
+
+def is_revoked(token: str) -> bool:
+    """True if the token is known to be revoked (False means "check the DB")."""
+    with _lock:
+        return token in _revoked
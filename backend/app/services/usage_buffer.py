@@ -0,0 +1,116 @@
+"""
+Contractor Vault - Token Usage Buffer
+Write-behind buffer for session token usage counters
+"""
+import asyncio
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import bindparam, update
+from starlette.concurrency import run_in_threadpool
+
+from app.database import engine
+from app.models.session_token import SessionToken
+
+logger = logging.getLogger("contractor_vault.usage_buffer")
+
+# Flush pending counters at least this often...
+FLUSH_INTERVAL_SECONDS = 5.0
+# ...or as soon as a single token has this many unflushed uses
+FLUSH_THRESHOLD = 100
+
+
+class TokenUsageBuffer:
+    """
+    Accumulates use_count / last_used_at updates in memory and writes them
+    to session_tokens in one batched UPDATE.
+
+    Claims only touch this buffer, which takes the per-claim UPDATE off the
+    request path. Counters not yet flushed are lost if the process dies;
+    every claim is still recorded in the audit log.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # token_id -> [unflushed uses, latest use timestamp]
+        self._pending: dict[str, list] = {}
+        self._update_stmt = (
+            update(SessionToken.__table__)
+            .where(SessionToken.__table__.c.id == bindparam("b_id"))
+            .values(
+                use_count=SessionToken.__table__.c.use_count + bindparam("b_uses"),
+                last_used_at=bindparam("b_last_used_at"),
+            )
+        )
+
+    def record(self, token_id: str, used_at: datetime) -> int:
+        """
+        Buffer one use of a token.
+
+        Returns:
+            Number of uses of this token not yet written to the database
+        """
+        with self._lock:
+            entry = self._pending.setdefault(token_id, [0, used_at])
+            entry[0] += 1
+            entry[1] = used_at
+            pending = entry[0]
+
+        if pending >= FLUSH_THRESHOLD:
+            self.flush()
+
+        return pending
+
+    def flush(self) -> int:
+        """
+        Write all pending counters in a single executemany UPDATE.
+
+        Returns:
+            Number of tokens updated
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        if not pending:
+            return 0
+
+        params = [
+            {"b_id": token_id, "b_uses": uses, "b_last_used_at": last_used_at}
+            for token_id, (uses, last_used_at) in pending.items()
+        ]
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(self._update_stmt, params)
+        except Exception as e:
+            logger.error(f"Failed to flush token usage for {len(pending)} tokens: {e}")
+            # Put the counts back so the next flush retries them
+            with self._lock:
+                for token_id, (uses, last_used_at) in pending.items():
+                    entry = self._pending.setdefault(token_id, [0, last_used_at])
+                    entry[0] += uses
+                    entry[1] = max(entry[1], last_used_at)
+            return 0
+
+        logger.debug(f"Flushed usage counters for {len(pending)} tokens")
+        return len(pending)
+
+    async def run(self, interval: float = FLUSH_INTERVAL_SECONDS) -> None:
+        """Periodically flush pending counters until cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                await run_in_threadpool(self.flush)
+        finally:
+            self.flush()
+
+
+_usage_buffer = None
+
+def get_usage_buffer() -> TokenUsageBuffer:
+    """Get singleton token usage buffer."""
+    global _usage_buffer
+    if _usage_buffer is None:
+        _usage_buffer = TokenUsageBuffer()
+    return _usage_buffer
@@ -3,8 +3,14 @@ Utility modules for Contractor Vault
 """
 from app.utils.rate_limiter import limiter, rate_limit_exceeded_handler
 from app.utils.password import hash_password, verify_password
+from app.utils.responses import ORJSONResponse
+from app.utils.ids import uuid7
+from app.utils.emails import Email
 
 __all__ = [
     "limiter", "rate_limit_exceeded_handler",
-    "hash_password", "verify_password"
+    "hash_password", "verify_password",
+    "ORJSONResponse",
+    "uuid7",
+    "Email",
 ]
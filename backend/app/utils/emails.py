@@ -0,0 +1,15 @@
+"""
+Contractor Vault - Lightweight Email Type
+Syntax-only email check for trusted admin inputs
+"""
+from typing import Annotated
+
+from pydantic import StringConstraints
+
+# One "@", no whitespace, and a dot somewhere in the domain
+EMAIL_PATTERN = r"^[^@\s]+@[^@\s]+\.[^@\s]+$"
+
+# Validated by pydantic-core's compiled regex, without calling into
+# email-validator. Unlike EmailStr it does not normalize the address, so
+# keep EmailStr on public sign-in and sign-up forms.
+Email = Annotated[str, StringConstraints(strip_whitespace=True, pattern=EMAIL_PATTERN)]
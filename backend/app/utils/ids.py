@@ -0,0 +1,22 @@
+"""
+Contractor Vault - Identifier Generation
+Time-ordered ids so new rows land at the right edge of the primary key index
+"""
+import os
+import time
+import uuid
+
+
+def uuid7() -> uuid.UUID:
+    """
+    Generate a UUIDv7 (RFC 9562).
+    
+    The first 48 bits are the Unix time in milliseconds and the rest is
+    random, so ids sort by creation time while staying unguessable.
+    """
+    value = (time.time_ns() // 1_000_000) << 80
+    value |= int.from_bytes(os.urandom(10), "big")
+    # Version 7 and RFC 4122 variant bits
+    value = (value & ~(0xF << 76)) | (0x7 << 76)
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)
+    return uuid.UUID(int=value)
@@ -0,0 +1,21 @@
+"""
+JSON response classes backed by orjson
+"""
+from typing import Any
+
+import orjson
+from fastapi.responses import JSONResponse
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered with orjson.
+
+    Use for endpoints that return plain dicts/lists (no response_model).
+    Leave routes with a response_model on the default response class:
+    FastAPI then dumps the model straight to JSON bytes with Pydantic,
+    which a custom response class disables.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -0,0 +1,66 @@
+"""
+Contractor Vault - Auth Token Tests
+"""
+from datetime import datetime, timezone, timedelta
+
+import jwt
+
+from app.config import get_settings
+from app.routers.auth import (
+    _jwt_decode,
+    create_auth_token,
+    create_reset_token,
+    decode_auth_token,
+    decode_reset_token,
+)
+
+
+class TestAuthTokens:
+    """Test suite for the dashboard auth JWT helpers."""
+    
+    def test_auth_token_roundtrip(self):
+        """Test that a created auth token decodes to its claims."""
+        token = create_auth_token("user_123", "a@example.com")
+        
+        payload = decode_auth_token(token)
+        
+        assert payload["sub"] == "user_123"
+        assert payload["email"] == "a@example.com"
+    
+    def test_matches_pyjwt(self):
+        """Test that tokens are interchangeable with PyJWT HS256 tokens."""
+        secret = get_settings().jwt_secret
+        now = datetime.now(timezone.utc)
+        
+        ours = create_auth_token("user_123", "a@example.com")
+        claims = jwt.decode(ours, secret, algorithms=["HS256"])
+        assert claims["sub"] == "user_123"
+        
+        theirs = jwt.encode({"sub": "user_123", "exp": now + timedelta(hours=1)}, secret, algorithm="HS256")
+        assert _jwt_decode(theirs)["sub"] == "user_123"
+    
+    def test_expired_token_rejected(self):
+        """Test that an expired token does not decode."""
+        secret = get_settings().jwt_secret
+        token = jwt.encode(
+            {"sub": "user_123", "exp": datetime.now(timezone.utc) - timedelta(seconds=1)},
+            secret,
+            algorithm="HS256",
+        )
+        
+        assert _jwt_decode(token) is None
+    
+    def test_wrong_key_or_algorithm_rejected(self):
+        """Test that forged and unsigned tokens do not decode."""
+        claims = {"sub": "user_123", "exp": datetime.now(timezone.utc) + timedelta(hours=1)}
+        
+        assert _jwt_decode(jwt.encode(claims, "x" * 32, algorithm="HS256")) is None
+        assert _jwt_decode(jwt.encode(claims, None, algorithm="none")) is None
+        assert _jwt_decode("not-a-token") is None
+    
+    def test_reset_token_type_enforced(self):
+        """Test that an auth token is not accepted as a reset token."""
+        reset = create_reset_token("user_123", "a@example.com")
+        
+        assert decode_reset_token(reset)["sub"] == "user_123"
+        assert decode_reset_token(create_auth_token("user_123", "a@example.com")) is None
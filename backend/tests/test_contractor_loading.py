@@ -0,0 +1,77 @@
+"""
+Contractor Vault - Contractor Query Loading Tests
+"""
+import json
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.contractor_account import ContractorAccount, ClientLink
+from app.routers.contractor import get_contractor_profile, get_linked_clients, unlink_client
+from app.services import contractor_cache
+
+
+@pytest.fixture
+def db():
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(
+        engine, tables=[ContractorAccount.__table__, ClientLink.__table__]
+    )
+    session = sessionmaker(bind=engine)()
+    
+    contractor = ContractorAccount(email="dev@example.com")
+    session.add(contractor)
+    session.flush()
+    session.add_all([
+        ClientLink(contractor_id=contractor.id, client_name="Acme", client_api_url="https://acme.test"),
+        ClientLink(contractor_id=contractor.id, client_name="Globex", client_api_url="https://globex.test"),
+        ClientLink(contractor_id=contractor.id, client_name="Initech", client_api_url="https://initech.test", is_active=False),
+    ])
+    session.commit()
+    session.expunge_all()
+    contractor_cache.clear()
+    
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    session.info["statements"] = statements
+    
+    yield session
+    
+    session.close()
+    contractor_cache.clear()
+
+
+class TestContractorLoading:
+    """Guard the contractor endpoints against lazy loads and N+1 queries."""
+    
+    def test_profile_is_one_query(self, db):
+        """Test that the profile and its active links load in one statement."""
+        profile = json.loads(get_contractor_profile(email="dev@example.com", db=db).body)
+        
+        assert sorted(c["client_name"] for c in profile["linked_clients"]) == ["Acme", "Globex"]
+        assert len(db.info["statements"]) == 1
+    
+    def test_clients_is_one_query(self, db):
+        """Test that listing linked clients serializes without further queries."""
+        clients = json.loads(get_linked_clients(email="dev@example.com", db=db).body)
+        
+        assert len(clients) == 3
+        assert len(db.info["statements"]) == 1
+    
+    def test_unlink_invalidates_only_that_contractor(self, db):
+        """Test that unlinking drops the owner's snapshots and no one else's."""
+        get_linked_clients(email="dev@example.com", db=db)
+        contractor_cache.put(contractor_cache.CLIENTS, "other@example.com", b"[]")
+        link_id = db.query(ClientLink.id).filter(ClientLink.client_name == "Acme").scalar()
+        
+        unlink_client(link_id=link_id, db=db)
+        
+        assert contractor_cache.get(contractor_cache.CLIENTS, "dev@example.com") is None
+        assert contractor_cache.get(contractor_cache.CLIENTS, "other@example.com") == b"[]"
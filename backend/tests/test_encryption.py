@@ -2,7 +2,8 @@
 Contractor Vault - Encryption Service Tests
 """
 import pytest
-from app.services.encryption import EncryptionService, EncryptionError
+from cryptography.fernet import Fernet
+from app.services.encryption import AESGCM_AAD_VERSION, AESGCM_VERSION, EncryptionService, EncryptionError
 
 
 class TestEncryptionService:
@@ -61,3 +62,65 @@ class TestEncryptionService:
         
         # But both should decrypt to same value
         assert service.decrypt(encrypted1) == service.decrypt(encrypted2)
+    
+    def test_encrypts_with_aesgcm(self):
+        """Test that new values use the versioned AES-GCM format."""
+        service = EncryptionService()
+        
+        assert service.encrypt("value").startswith(AESGCM_VERSION)
+    
+    def test_decrypts_legacy_fernet_token(self):
+        """Test that values stored as Fernet tokens still decrypt."""
+        service = EncryptionService()
+        
+        legacy = service._fernet.encrypt(b"legacy-password")
+        
+        assert service.decrypt(legacy) == "legacy-password"
+    
+    def test_associated_data_must_match(self):
+        """Test that a value bound to associated data needs the same data."""
+        service = EncryptionService()
+        
+        encrypted = service.encrypt("cookies", associated_data=b"example.com")
+        
+        assert service.decrypt(encrypted, associated_data=b"example.com") == "cookies"
+        with pytest.raises(EncryptionError):
+            service.decrypt(encrypted, associated_data=b"other.com")
+        with pytest.raises(EncryptionError):
+            service.decrypt(encrypted)
+    
+    def test_decrypt_tampered_ciphertext_raises(self):
+        """Test that a modified AES-GCM ciphertext fails authentication."""
+        service = EncryptionService()
+        
+        encrypted = bytearray(service.encrypt("value"))
+        encrypted[-1] ^= 1
+        
+        with pytest.raises(EncryptionError):
+            service.decrypt(bytes(encrypted))
+    
+    def test_decrypt_bytes_returns_raw_plaintext(self):
+        """Test that decrypt_bytes skips the str decode and accepts memoryviews."""
+        service = EncryptionService()
+        
+        encrypted = service.encrypt(b'{"a": 1}', associated_data=b"example.com")
+        legacy = service._fernet.encrypt(b"legacy")
+        
+        assert service.decrypt_bytes(memoryview(encrypted), b"example.com") == b'{"a": 1}'
+        assert service.decrypt_bytes(legacy) == b"legacy"
+    
+    def test_rotate_key_reseals_with_new_key(self):
+        """Test that rotation keeps associated data and switches keys."""
+        service = EncryptionService()
+        new_service = EncryptionService(Fernet.generate_key().decode())
+        
+        encrypted = service.encrypt("cookies", associated_data=b"example.com")
+        rotated = service.rotate_key(encrypted, new_service, associated_data=b"example.com")
+        
+        assert rotated.startswith(AESGCM_AAD_VERSION)
+        assert new_service.decrypt(rotated, associated_data=b"example.com") == "cookies"
+        with pytest.raises(EncryptionError):
+            service.decrypt(rotated, associated_data=b"example.com")
+        
+        legacy = service._fernet.encrypt(b"legacy-password")
+        assert new_service.decrypt(service.rotate_key(legacy, new_service)) == "legacy-password"
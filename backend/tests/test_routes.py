@@ -0,0 +1,32 @@
+"""
+Contractor Vault - Route Registration Tests
+"""
+from collections import Counter
+
+from fastapi.routing import APIRoute
+
+from app.main import app
+from app.routers.auth import router as auth_router
+
+
+class TestRouteRegistration:
+    """Guard against auth endpoints being defined or mounted more than once."""
+    
+    def test_auth_router_has_no_duplicate_routes(self):
+        """Each (method, path) pair in the auth router is defined exactly once."""
+        counts = Counter(
+            (method, route.path)
+            for route in auth_router.routes
+            if isinstance(route, APIRoute)
+            for method in route.methods
+        )
+        duplicates = [key for key, count in counts.items() if count > 1]
+        
+        assert duplicates == []
+    
+    def test_auth_routes_mounted(self):
+        """The auth router is mounted with its OTP and password flows."""
+        paths = app.openapi()["paths"]
+        
+        for path in ("/api/auth/request-otp", "/api/auth/verify-otp", "/api/auth/password-login", "/api/auth/logout"):
+            assert path in paths
@@ -0,0 +1,111 @@
+"""
+Contractor Vault - Token Usage Buffer Tests
+"""
+from datetime import datetime, timezone, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models.session_token import SessionToken
+from app.services import usage_buffer
+from app.services.usage_buffer import TokenUsageBuffer
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine, tables=[SessionToken.__table__])
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(SessionToken.__table__.insert(), [
+            {
+                "id": token_id,
+                "token": f"token-{token_id}",
+                "credential_id": "cred",
+                "contractor_email": "dev@example.com",
+                "is_one_time": False,
+                "expires_at": now + timedelta(hours=1),
+                "is_revoked": False,
+                "created_at": now,
+                "created_by": "admin@example.com",
+                "use_count": 0,
+            }
+            for token_id in ("tok-a", "tok-b")
+        ])
+    monkeypatch.setattr(usage_buffer, "engine", engine)
+    return engine
+
+
+def _usage(engine) -> dict:
+    table = SessionToken.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(select(table.c.id, table.c.use_count, table.c.last_used_at))
+        return {row.id: (row.use_count, row.last_used_at) for row in rows}
+
+
+class TestTokenUsageBuffer:
+    """Test suite for the write-behind token usage buffer."""
+    
+    def test_record_counts_pending_uses(self, engine):
+        """Test that record returns the unflushed uses of that token."""
+        buffer = TokenUsageBuffer()
+        now = datetime.now(timezone.utc)
+        
+        assert buffer.record("tok-a", now) == 1
+        assert buffer.record("tok-a", now) == 2
+        assert buffer.record("tok-b", now) == 1
+        assert _usage(engine)["tok-a"][0] == 0
+    
+    def test_flush_writes_counts_and_latest_use(self, engine):
+        """Test that a flush adds the pending uses and keeps the latest timestamp."""
+        buffer = TokenUsageBuffer()
+        first = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        last = first + timedelta(minutes=5)
+        
+        buffer.record("tok-a", first)
+        buffer.record("tok-a", last)
+        buffer.record("tok-b", first)
+        
+        assert buffer.flush() == 2
+        assert _usage(engine) == {"tok-a": (2, last), "tok-b": (1, first)}
+        
+        # Nothing pending, so a second flush writes nothing
+        assert buffer.flush() == 0
+        assert buffer.record("tok-a", last) == 1
+    
+    def test_failed_flush_restores_counts(self, engine, monkeypatch):
+        """Test that counts from a failed flush are kept for the next one."""
+        buffer = TokenUsageBuffer()
+        first = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        retry = first + timedelta(minutes=5)
+        
+        buffer.record("tok-a", first)
+        buffer.record("tok-a", first)
+        
+        broken = create_engine("sqlite://")
+        monkeypatch.setattr(usage_buffer, "engine", broken)
+        assert buffer.flush() == 0
+        
+        # Uses recorded after the failure are merged with the restored ones
+        buffer.record("tok-a", retry)
+        monkeypatch.setattr(usage_buffer, "engine", engine)
+        
+        assert buffer.flush() == 1
+        assert _usage(engine)["tok-a"] == (3, retry)
+    
+    def test_threshold_triggers_flush(self, engine):
+        """Test that reaching the per-token threshold flushes immediately."""
+        buffer = TokenUsageBuffer()
+        now = datetime(2026, 1, 1, 12, 0, tzinfo=timezone.utc)
+        
+        for _ in range(usage_buffer.FLUSH_THRESHOLD):
+            buffer.record("tok-a", now)
+        
+        assert _usage(engine)["tok-a"] == (usage_buffer.FLUSH_THRESHOLD, now)
+        assert buffer.flush() == 0
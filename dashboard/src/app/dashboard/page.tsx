@@ -293,7 +293,9 @@ export default function Dashboard() {
             });
             if (res.ok) {
                 const result = await res.json();
-                alert(`Magic link created!\nDemo token: ${result.demo_token}`);
+                alert(result.demo_token
+                    ? `Magic link created!\nDemo token: ${result.demo_token}`
+                    : `Magic link sent to ${email}`);
             }
         } catch (e) { console.error(e); }
     };